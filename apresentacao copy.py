@@ -1,369 +1,192 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
-from sqlalchemy import create_engine
-import altair as alt
 import datetime
-import numpy as np
-import requests
+import time
 
-# ========================================================
-#           CONFIGURAÇÕES DO BANCO DE DADOS
-# ========================================================
-DB_CONFIG = {
-    "host": st.secrets["db_host"],
-    "user": st.secrets["db_user"],
-    "password": st.secrets["db_password"],
-    "database": st.secrets["db_name"],
-    "port": 3306
-}
-
-DB_URL = f"mysql+mysqlconnector://{st.secrets['db_user']}:{st.secrets['db_password']}@{st.secrets['db_host']}:3306/{st.secrets['db_name']}"
-
-# ========================================================
-#     FUNÇÃO PARA LER DADOS (POR SEMANA)
-# ========================================================
-@st.cache_data(ttl=300)
-def carregar_dados():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        WITH AllData AS (
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(data_Projeto, INTERVAL WEEKDAY(data_Projeto) DAY) AS DATE) AS Semana_Inicio, 
-                volumeProjetado AS Volume_Projetado, 0 AS Volume_Fabricado, 0 AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE data_Projeto IS NOT NULL AND volumeProjetado > 0
-            UNION ALL
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(data_Acabamento, INTERVAL WEEKDAY(data_Acabamento) DAY) AS DATE) AS Semana_Inicio, 
-                0 AS Volume_Projetado, volumeFabricado AS Volume_Fabricado, 0 AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE data_Acabamento IS NOT NULL AND volumeFabricado > 0
-            UNION ALL
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(dataMontada, INTERVAL WEEKDAY(dataMontada) DAY) AS DATE) AS Semana_Inicio, 
-                0 AS Volume_Projetado, 0 AS Volume_Fabricado, volumeMontado AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE dataMontada IS NOT NULL AND volumeMontado > 0
-        )
-        SELECT
-            Obra, Semana_Inicio AS Semana, 
-            SUM(Volume_Projetado) AS Volume_Projetado,
-            SUM(Volume_Fabricado) AS Volume_Fabricado,
-            SUM(Volume_Montado) AS Volume_Montado
-        FROM AllData
-        GROUP BY Obra, Semana_Inicio ORDER BY Obra, Semana_Inicio;
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df.loc[df['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df = df.groupby(['Obra', 'Semana'], as_index=False)[['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']].sum()
-    return df
-
-# ========================================================
-# FUNÇÃO PARA LER DADOS (TOTAIS POR OBRA)
-# ========================================================
-@st.cache_data(ttl=300)
-def carregar_dados_gerais():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT
-            nomeObra AS Obra,
-            SUM(volumeProjetado) AS Projetado,
-            SUM(volumeFabricado) AS Fabricado,
-            SUM(volumeAcabado) AS Acabado,
-            SUM(volumeExpedido) AS Expedido,
-            SUM(volumeMontado) AS Montado,
-            AVG(peso_frouxo_por_volume) AS "Taxa de Aço" 
-        FROM `plannix-db`.`plannix`
-        GROUP BY nomeObra
-        ORDER BY nomeObra;
-    """
-    df_geral = pd.read_sql(query, conn)
-    conn.close()
-
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df_geral.loc[df_geral['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df_geral = df_geral.groupby('Obra', as_index=False).agg({
-        'Projetado': 'sum', 'Fabricado': 'sum', 'Acabado': 'sum',
-        'Expedido': 'sum', 'Montado': 'sum', 'Taxa de Aço': 'mean' 
-    })
-    return df_geral
-
-# ========================================================
-# FUNÇÃO PARA LER DADOS (POR FAMÍLIA)
-# ========================================================
-@st.cache_data(ttl=300)
-def carregar_dados_familias():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT nomeObra AS Obra, familia AS Familia, COUNT(nomePeca) AS unidade, SUM(volumeReal) AS Volume
-        FROM `plannix-db`.`plannix`
-        WHERE familia IS NOT NULL AND nomePeca IS NOT NULL AND volumeReal IS NOT NULL
-        GROUP BY nomeObra, familia ORDER BY Obra, Familia;
-    """
-    df_familias = pd.read_sql(query, conn)
-    conn.close()
-    
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df_familias.loc[df_familias['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df_familias = df_familias.groupby(['Obra', 'Familia'], as_index=False).sum()
-    return df_familias
-
-# ========================================================
-# FUNÇÕES RESTAURADAS PARA O PLANEJADOR
-# ========================================================
-@st.cache_data(ttl=300)
-def carregar_datas_limite_etapas(obra_nome):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    # Correção de segurança: Uso de bind parameters (%s) para evitar SQL Injection
-    query = """
-        SELECT 
-            MIN(data_Projeto) as ini_proj, MAX(data_Projeto) as fim_proj,
-            MIN(data_Acabamento) as ini_fab, MAX(data_Acabamento) as fim_fab,
-            MIN(dataMontada) as ini_mont, MAX(dataMontada) as fim_mont
-        FROM `plannix-db`.`plannix`
-        WHERE nomeObra = %s
-    """
-    df = pd.read_sql(query, conn, params=(obra_nome,))
-    conn.close()
-    return df
-
-@st.cache_data(ttl=300)
-def calcular_medias_cronograma():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT
-            AVG(DATEDIFF(fim_p, ini_p)) as dias_duracao_proj,
-            AVG(DATEDIFF(ini_f, ini_p)) as dias_lag_fab, 
-            AVG(DATEDIFF(fim_f, ini_f)) as dias_duracao_fab,
-            AVG(DATEDIFF(ini_m, ini_p)) as dias_lag_mont, 
-            AVG(DATEDIFF(fim_m, ini_m)) as dias_duracao_mont
-        FROM (
-            SELECT
-                nomeObra,
-                MIN(data_Projeto) as ini_p, MAX(data_Projeto) as fim_p,
-                MIN(data_Acabamento) as ini_f, MAX(data_Acabamento) as fim_f,
-                MIN(dataMontada) as ini_m, MAX(dataMontada) as fim_m
-            FROM `plannix-db`.`plannix`
-            GROUP BY nomeObra
-            HAVING ini_p IS NOT NULL AND ini_f IS NOT NULL AND ini_m IS NOT NULL
-        ) as sub
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
-# ========================================================
-# FUNÇÃO PARA CARREGAR DADOS SALVOS DO USUÁRIO
-# ========================================================
-def carregar_dados_usuario():
-    engine = create_engine(DB_URL)
-    df_orcamentos_salvos = pd.DataFrame(columns=["Obra", "Orcamento", "Orcamento Lajes"])
-    df_previsoes_salvas = pd.DataFrame(columns=["Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"])
-
-    try:
-        df_orcamentos_salvos = pd.read_sql("SELECT * FROM orcamentos_usuario", con=engine)
-    except:
-        pass
-    
-    try:
-        df_previsoes_salvas = pd.read_sql("SELECT * FROM previsoes_usuario", con=engine)
-        if not df_previsoes_salvas.empty:
-            df_previsoes_salvas['Semana'] = pd.to_datetime(df_previsoes_salvas['Semana'])
-    except:
-        pass
-
-    engine.dispose()
-    return df_orcamentos_salvos, df_previsoes_salvas
-
-# ========================================================
-# FUNÇÃO HELPER PARA FORMATAR A SEMANA
-# ========================================================
-def formatar_semana(date):
-    if pd.isna(date): return None
-    if isinstance(date, str):
-        try: date = pd.to_datetime(date)
-        except: return date
-    start_str = date.strftime('%d/%m')
-    end_str = (date + pd.Timedelta(days=6)).strftime('%d/%m')
-    return f"{start_str} á {end_str} ({date.strftime('%Y')})"
-
-# ========================================================
-# FUNÇÃO PARA BUSCAR DADOS DO WAR ROOM (API)
-# ========================================================
-WAR_ROOM_URL = "https://war-room-vejv.vercel.app/api/war-room"
-
-@st.cache_data(ttl=10)
-def carregar_war_room():
-    resp = requests.get(WAR_ROOM_URL, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    if not isinstance(data, list):
-        raise ValueError("Resposta inesperada da API War Room.")
-    return data
-
-# ========================================================
-# FUNÇÃO PARA BUSCAR DADOS DO WAR ROOM SEMANAL (API)
-# ========================================================
-WAR_ROOM_WEEK_URL = "https://war-room-vejv.vercel.app/api/war-room-week"
-
-@st.cache_data(ttl=300)
-def carregar_war_room_week():
-    resp = requests.get(WAR_ROOM_WEEK_URL, timeout=15)
-    resp.raise_for_status()
-    data = resp.json()
-    if not isinstance(data, list):
-        raise ValueError("Resposta inesperada da API War Room Week.")
-    return data
+import banco
+from carga_inicial import carregar_em_paralelo
+from carregamento import (
+    carregar_dados_gerais, carregar_dados_familias, carregar_catalogo_obras, usar_filtro_no_banco, chave_filtro,
+    carregar_indice_etapas, carregar_datas_limite_obras, carregar_curvas_familias, calcular_medias_cronograma,
+)
+from kpis import kpis_obras, versao_frame, CONFIG_COLUNAS_KPI
+from war_room import (
+    carregar_war_room, carregar_war_room_week, cliente_war_room, cliente_war_room_week, legenda_idade,
+)
+from preparacao import MotorPrevisoes
+from semanas import rotular_semanas, rotular_intervalos
+from memoria import registrar_memoria, limite_excedido, bytes_sessao, medir_bytes, tabela_memoria, LIMITE_MEMORIA_SESSAO_MB
+from base_compartilhada import (
+    carregar_base_compartilhada, carregar_base_filtrada, aplicar_orcamentos_editados, aplicar_previsoes_editadas, recortar_semanal,
+    preencher_datas_reais,
+)
+from graficos import loja_graficos, spec_para_exibir
+from diagnostico import (
+    medir, registrar_evento, registrar_etapas_sessao, diagnostico_liberado, registro_diagnostico, resumo_tempos,
+)
+from planejador import MEDIA_GERAL, perfis_das_obras, projetar_cenarios, resumir_cenarios, combinar_curvas
+from risco_cronograma import CENARIOS_PADRAO, PERCENTIS, perfis_historicos, simular_risco, grafico_leque
 
 # ========================================================
-# FUNÇÃO PARA SALVAR DADOS NO MYSQL
+# FUNÇÃO PARA SALVAR DADOS NO MYSQL (SÓ AS LINHAS ALTERADAS)
 # ========================================================
 def salvar_dados_usuario(df_previsoes, df_orcamentos):
-    engine = create_engine(DB_URL)
+    inicio = time.perf_counter()
     try:
         df_previsoes_limpo = df_previsoes.dropna(subset=['Obra', 'Semana'])
-        df_save_previsoes = df_previsoes_limpo[[
-            "Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"
-        ]].copy()
-        df_save_previsoes['Semana'] = pd.to_datetime(df_save_previsoes['Semana']).dt.strftime('%Y-%m-%d')
-        
-        df_save_previsoes.to_sql('previsoes_usuario', con=engine, if_exists='replace', index=False)
-        df_orcamentos.to_sql('orcamentos_usuario', con=engine, if_exists='replace', index=False)
-        st.success("✅ **Alterações salvas com sucesso no banco de dados!**")
+        df_save_previsoes = df_previsoes_limpo[banco.COLUNAS_PREVISOES].copy()
+        chaves_salvas = list(zip(df_save_previsoes['Obra'], pd.to_datetime(df_save_previsoes['Semana'])))
+        df_save_previsoes['Semana'] = pd.to_datetime(df_save_previsoes['Semana']).dt.date
+
+        df_save_orcamentos = df_orcamentos.dropna(subset=['Obra'])
+        df_save_orcamentos = df_save_orcamentos[[c for c in banco.COLUNAS_ORCAMENTOS if c in df_save_orcamentos.columns]].copy()
+        for col in banco.COLUNAS_DATA_ORCAMENTOS:
+            if col in df_save_orcamentos.columns:
+                df_save_orcamentos[col] = pd.to_datetime(df_save_orcamentos[col], errors='coerce').dt.date
+
+        banco.garantir_tabelas_usuario()
+        with banco.transacao() as conn:
+            linhas = banco.upsert(conn, 'previsoes_usuario', df_save_previsoes, ['Obra', 'Semana'])
+            linhas += banco.upsert(conn, 'orcamentos_usuario', df_save_orcamentos, ['Obra'])
+        st.session_state['orcamentos_alterados'] = set()
+        st.session_state['previsoes_nao_salvas'] = st.session_state.get('previsoes_nao_salvas', set()) - set(chaves_salvas)
+        # A base compartilhada traz o que está salvo: as outras sessões passam a ver estes valores
+        carregar_base_compartilhada.clear()
+        carregar_base_filtrada.clear()
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        st.success(f"✅ **Alterações salvas com sucesso no banco de dados!** ({linhas} linhas em {duracao_ms:.0f} ms)")
     except Exception as e:
         st.error(f"❌ Erro ao salvar dados no banco de dados: {e}")
-    finally:
-        engine.dispose()
-        
+
+def orcamentos_da_sessao():
+    return aplicar_orcamentos_editados(base.orcamentos, st.session_state.get('orcamentos_editados'))
+
+def orcamentos_alterados():
+    alterados = st.session_state.get('orcamentos_alterados', set())
+    df_orcamentos = orcamentos_da_sessao()
+    return df_orcamentos[df_orcamentos['Obra'].isin(alterados)]
+
 # ========================================================
 #                INTERFACE STREAMLIT
 # ========================================================
 st.set_page_config(page_title="Reunião de Prazos", layout="wide")
+inicio_rerun = time.perf_counter()
 st.title("📊 Reunião de Prazos")
 
 # --- 1. CARREGAMENTO INICIAL ---
+# Todas as fontes em paralelo; as APIs do War Room são opcionais e não seguram a página.
+# Com poucas obras no filtro (valor do multiselect guardado na sessão) a extração completa
+# não é lida: o catálogo vem do índice de etapas e o semanal e os totais, de consultas
+# filtradas no banco (só o Planejador, que compara com o histórico, lê todas as obras).
+filtro_no_banco = usar_filtro_no_banco(st.session_state.get("filtro_obras"))
+fontes = {"catalogo": carregar_catalogo_obras}
+if not filtro_no_banco:
+    fontes.update({"base": carregar_base_compartilhada, "gerais": carregar_dados_gerais, "familias": carregar_dados_familias})
+fontes.update({"war_room": carregar_war_room, "war_room_semanal": carregar_war_room_week})
+carga = carregar_em_paralelo(fontes, opcionais={"war_room", "war_room_semanal"})
+st.session_state['latencias_carga'] = carga.latencias
+for nome, segundos in carga.latencias.items():
+    # Só o tempo: linhas e bytes já saem no evento do loader (medidos uma vez, no miss)
+    registrar_evento("carga", nome, segundos * 1000)
+
 try:
-    df_base = carregar_dados()
-    df_orcamentos_salvos, df_previsoes_salvas = carregar_dados_usuario()
+    catalogo = carga.obter("catalogo")
 except Exception as e:
     st.error(f"Erro fatal ao carregar dados do MySQL: {e}")
     st.stop()
 
-df_base['Semana'] = pd.to_datetime(df_base['Semana'])
-todas_obras_lista = df_base["Obra"].unique().tolist()
-
-# --- 2.5 INICIALIZAÇÃO DO SESSION STATE ---
-if 'orcamentos' not in st.session_state:
-    df_orcamentos_base = pd.DataFrame({"Obra": todas_obras_lista})
-    df_orcamentos_para_editor = df_orcamentos_base.merge(df_orcamentos_salvos, on="Obra", how="left")
-    st.session_state['orcamentos'] = df_orcamentos_para_editor
+todas_obras_lista = catalogo.index.tolist()
 
-# --- LIMPEZA DE COLUNAS ANTIGAS ---
-cols_remover = ["Prazo Projeto", "Prazo Fabricacao", "Prazo Montagem", "Data Inicio"]
-st.session_state['orcamentos'] = st.session_state['orcamentos'].drop(
-    columns=[c for c in cols_remover if c in st.session_state['orcamentos'].columns], 
-    errors='ignore'
-)
-
-# Blindagem de Colunas Novas (Cria se não existir)
-cols_datas_necessarias = ["Ini Projeto", "Fim Projeto", "Ini Fabricacao", "Fim Fabricacao", "Ini Montagem", "Fim Montagem"]
-for col in cols_datas_necessarias:
-    if col not in st.session_state['orcamentos'].columns:
-        st.session_state['orcamentos'][col] = None
-
-defaults_num = {'Orcamento': 100.0, 'Orcamento Lajes': 0.0}
-for col, val in defaults_num.items():
-    if col not in st.session_state['orcamentos'].columns:
-        st.session_state['orcamentos'][col] = val
-    else:
-        st.session_state['orcamentos'][col] = st.session_state['orcamentos'][col].fillna(val)
+# --- 2.5 CADASTRO DA SESSÃO ---
+# O cadastro salvo vem da base compartilhada; a sessão guarda só as células editadas
+# em 'orcamentos_editados' ({obra: {coluna: valor}}), aplicadas na hora de exibir.
+cols_datas_necessarias = banco.COLUNAS_DATA_ORCAMENTOS
 
 # --- 3. FILTRO GLOBAL ---
 st.subheader("⚙️ Filtros Globais")
 col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
-    obras_selecionadas = st.multiselect("Selecione as Obras:", options=todas_obras_lista, default=todas_obras_lista)
+    obras_selecionadas = st.multiselect("Selecione as Obras:", options=todas_obras_lista, default=todas_obras_lista, key="filtro_obras")
 with col2:
-    data_inicio = st.date_input("Data de Início:", value=df_base['Semana'].min() - pd.Timedelta(weeks=10))
+    data_inicio = st.date_input("Data de Início:", value=catalogo['Semana_Ini'].min() - pd.Timedelta(weeks=10))
 with col3:
-    data_fim = st.date_input("Data Final:", value=df_base['Semana'].max())
+    data_fim = st.date_input("Data Final:", value=catalogo['Semana_Fim'].max())
 
 data_inicio = pd.to_datetime(data_inicio)
 data_fim = pd.to_datetime(data_fim)
     
-# --- 4. PREPARAÇÃO DOS DADOS ---
-df_para_cumsum = df_base[(df_base["Obra"].isin(obras_selecionadas))].copy()
-
-# Preenchimento de Lacunas (Lógica Otimizada)
-zero_rows = []
-weeks_to_add = 10 
-for obra in obras_selecionadas:
-    obra_df = df_para_cumsum[df_para_cumsum['Obra'] == obra]
-    if not obra_df.empty:
-        curr = obra_df['Semana'].min()
-        for _ in range(weeks_to_add):
-            curr -= pd.Timedelta(days=7)
-            zero_rows.append({'Obra': obra, 'Semana': curr, 'Volume_Projetado': 0, 'Volume_Fabricado': 0, 'Volume_Montado': 0})
-        curr_fut = obra_df['Semana'].max()
-        for _ in range(weeks_to_add):
-            curr_fut += pd.Timedelta(days=7)
-            zero_rows.append({'Obra': obra, 'Semana': curr_fut, 'Volume_Projetado': 0, 'Volume_Fabricado': 0, 'Volume_Montado': 0})
-
-if zero_rows:
-    df_para_cumsum = pd.concat([pd.DataFrame(zero_rows), df_para_cumsum], ignore_index=True)
-
-dfs_preenchidos = []
-if not df_para_cumsum.empty:
-    for obra, dados in df_para_cumsum.groupby("Obra"):
-        dados = dados.groupby("Semana").sum(numeric_only=True).reset_index().set_index("Semana").sort_index()
-        idx_completo = pd.date_range(start=dados.index.min(), end=dados.index.max(), freq='7D')
-        dados = dados.reindex(idx_completo).fillna(0)
-        dados['Obra'] = obra
-        dfs_preenchidos.append(dados)
-    df_para_cumsum = pd.concat(dfs_preenchidos).reset_index().rename(columns={'index': 'Semana'})
-
-df_para_cumsum = df_para_cumsum.sort_values(["Obra", "Semana"]) 
-for col in ["Volume_Projetado", "Volume_Fabricado", "Volume_Montado"]:
-    df_para_cumsum[col] = df_para_cumsum.groupby("Obra")[col].cumsum()
-
-df = df_para_cumsum[(df_para_cumsum["Semana"] >= data_inicio) & (df_para_cumsum["Semana"] <= data_fim)].copy()
-
-if df.empty and not obras_selecionadas:
+if not obras_selecionadas:
     st.warning("Nenhuma obra encontrada.")
     st.stop()
 
-df['Semana_Display'] = df['Semana'].apply(formatar_semana)
-    
+# --- 3.5 BASE DA SESSÃO ---
+# Completa (compartilhada, recortada em memória) ou só das obras e período do filtro
+try:
+    chave = chave_filtro(obras_selecionadas, data_inicio, data_fim) if filtro_no_banco else None
+    base = carregar_base_filtrada(*chave) if filtro_no_banco else carga.obter("base")
+except Exception as e:
+    st.error(f"Erro fatal ao carregar dados do MySQL: {e}")
+    st.stop()
+
+def dados_gerais_da_sessao():
+    # No modo filtrado os totais por obra também vêm só das obras escolhidas
+    return carregar_dados_gerais(chave[0]) if filtro_no_banco else carregar_dados_gerais()
+
+# --- 4. PREPARAÇÃO DOS DADOS ---
+@medir("etapa", "preparar_dados_semanais")
+def preparar_dados_semanais(obras_selecionadas, data_inicio, data_fim):
+    # Recorte da base compartilhada (lacunas, acumulado, rótulos e previsões salvas já prontos)
+    # com o cadastro da sessão aplicado
+    df = recortar_semanal(base.semanal, orcamentos_da_sessao(), obras_selecionadas, data_inicio, data_fim)
+    registrar_memoria("semanal_filtrado", df)
+
+    if limite_excedido():
+        st.error(
+            f"⚠️ Esta seleção ocupa {bytes_sessao() / 2**20:.0f} MB, acima do limite de {LIMITE_MEMORIA_SESSAO_MB:.0f} MB por sessão. "
+            "Selecione menos obras ou um período menor."
+        )
+        st.stop()
+    return df
+
+# --- PREVISÕES EDITADAS NESTA SESSÃO ---
+# Guardadas por (Obra, Semana) fora do widget, para sobreviverem à troca de aba
+# (o estado do st.data_editor some quando ele deixa de ser renderizado).
+# 'previsoes_nao_salvas' marca quais delas o próximo salvamento precisa enviar.
+def previsoes_pendentes(df_editado):
+    nao_salvas = st.session_state.get('previsoes_nao_salvas', set())
+    chaves = pd.MultiIndex.from_frame(df_editado[['Obra', 'Semana']])
+    return df_editado[chaves.isin(list(nao_salvas))]
+
 # --- 5. ABAS ---
-tab_cadastro, tab_tabelas, tab_graficos, tab_geral, tab_planejador, tab_warroom = st.tabs([
-    "📁 Cadastro", "📊 Tabelas", "📈 Gráficos", "🌍 Tabela Geral", "📅 Planejador", "🏗️ War Room"
-])
+# Só a aba escolhida executa. Cada aba é um fragmento: cliques e edições dentro dela
+# reexecutam apenas o fragmento, não o carregamento e os filtros acima.
+ABAS = ["📁 Cadastro", "📊 Tabelas", "📈 Gráficos", "🌍 Tabela Geral", "📅 Planejador", "🏗️ War Room"]
+if diagnostico_liberado():
+    ABAS.append("🩺 Diagnóstico")
 
 # --- ABA 1: CADASTRO ---
-with tab_cadastro:
+@st.fragment
+@medir("aba", "Cadastro")
+def aba_cadastro(obras_selecionadas):
     st.subheader("💰 1. Orçamento e Datas das Etapas")
     st.info("Cadastre o orçamento e as datas de **Início e Fim** de cada etapa.")
     
-    # 1. Copia e filtra os dados da memória
-    orcamentos_filtrado = st.session_state['orcamentos'][st.session_state['orcamentos']['Obra'].isin(obras_selecionadas)].copy()
-    
-    # 2. Conversão de tipos (Blindagem)
-    for col in cols_datas_necessarias:
-        if col not in orcamentos_filtrado.columns: orcamentos_filtrado[col] = None
-        orcamentos_filtrado[col] = pd.to_datetime(orcamentos_filtrado[col], errors='coerce')
-
-    # --- CALLBACK DE SALVAMENTO AUTOMÁTICO ---
+    # 1. Cadastro da sessão (base salva + edições), filtrado pelas obras selecionadas
+    df_orcamentos = orcamentos_da_sessao()
+    orcamentos_filtrado = df_orcamentos[df_orcamentos['Obra'].isin(obras_selecionadas)]
+    # 2. Datas em branco com o início/fim real de cada etapa (índice de etapas, sem consulta)
+    orcamentos_filtrado = preencher_datas_reais(orcamentos_filtrado, carregar_indice_etapas().unificadas)
+    st.caption("Datas em branco no cadastro aparecem com o início/fim real da etapa no plannix; só são gravadas se você editar a célula.")
+
+    # --- CALLBACK: GUARDA SÓ AS CÉLULAS EDITADAS ---
     def atualizar_session_state():
         edits = st.session_state["editor_cadastro"]
         if edits["edited_rows"]:
+            editados = st.session_state.setdefault('orcamentos_editados', {})
             for index, changes in edits["edited_rows"].items():
-                real_index = orcamentos_filtrado.index[index]
-                for col_name, new_value in changes.items():
-                    st.session_state['orcamentos'].at[real_index, col_name] = new_value
+                obra = orcamentos_filtrado.iloc[int(index)]['Obra']
+                editados.setdefault(obra, {}).update(changes)
+                st.session_state.setdefault('orcamentos_alterados', set()).add(obra)
 
     # 3. O Editor de Dados
     st.data_editor(
@@ -389,22 +212,30 @@ with tab_cadastro:
     )
     
     if st.button("💾 Salvar Cadastro no Banco de Dados", key="btn_salvar_cadastro"):
-        salvar_dados_usuario(df_previsoes_salvas, st.session_state['orcamentos'])
-
-# --- 6. MERGE FINAL ---
-df_orcamentos_atual = st.session_state['orcamentos']
-df = df.merge(df_orcamentos_atual, on="Obra", how="left")
-for col in ["Projetado", "Fabricado", "Montado"]:
-    df[f"{col} %"] = (df[f"Volume_{col}"] / df["Orcamento"]) * 100
+        salvar_dados_usuario(pd.DataFrame(columns=banco.COLUNAS_PREVISOES), orcamentos_alterados())
 
-if not df_previsoes_salvas.empty:
-    df = df.merge(df_previsoes_salvas, on=["Obra", "Semana"], how="left")
-for col in ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]:
-    df[col] = df[col].fillna(0.0)
-df_para_edicao = df.copy() 
+@medir("etapa", "calcular_previsoes")
+def calcular_previsoes_sessao(df_editado):
+    # Só as obras editadas desde o último cálculo passam de novo pelo preenchimento
+    motor = st.session_state.setdefault('motor_previsoes', MotorPrevisoes())
+    alteradas = st.session_state.pop('obras_previsao_alteradas', set())
+    return registrar_memoria("calculado", motor.calcular(df_editado, base.versao, alteradas))
 
 # --- ABA 2: TABELAS ---
-with tab_tabelas:
+@st.fragment
+@medir("aba", "Tabelas")
+def aba_tabelas(df_para_edicao):
+    df_para_edicao = aplicar_previsoes_editadas(df_para_edicao, st.session_state.get('previsoes_editadas'))
+
+    # --- CALLBACK: GUARDA AS EDIÇÕES POR (OBRA, SEMANA) ---
+    def registrar_previsoes_editadas():
+        editadas = st.session_state.setdefault('previsoes_editadas', {})
+        for index, changes in st.session_state["dados_editor"]["edited_rows"].items():
+            linha = df_para_edicao.iloc[int(index)]
+            editadas.setdefault((linha['Obra'], linha['Semana']), {}).update(changes)
+            st.session_state.setdefault('previsoes_nao_salvas', set()).add((linha['Obra'], linha['Semana']))
+            st.session_state.setdefault('obras_previsao_alteradas', set()).add(linha['Obra'])
+
     st.subheader("Controles de Visualização")
     c1, c2 = st.columns(2)
     with c1: show_editor = st.checkbox("Mostrar Edição de Previsões", value=True)
@@ -416,33 +247,35 @@ with tab_tabelas:
         st.subheader("✏️ 2. Edite as Previsões Semanais")
         cols_ocultar = ["Obra", "Semana", "Semana_Display", "Volume_Projetado", "Projetado %", "Volume_Fabricado", "Fabricado %", "Volume_Montado", "Montado %", "Orcamento", "Orcamento Lajes"] + cols_datas_necessarias
         
-        df_editado = st.data_editor(
-            df_para_edicao, key="dados_editor", use_container_width=True, hide_index=True, disabled=cols_ocultar,
-            column_config={
-                "Semana_Display": "Semana", 
-                "Projeto Previsto %": st.column_config.NumberColumn(format="%.0f%%"),
-                "Fabricação Prevista %": st.column_config.NumberColumn(format="%.0f%%"),
-                "Montagem Prevista %": st.column_config.NumberColumn(format="%.0f%%"),
-            }
-        )
+        with medir("widget", "data_editor_previsoes", linhas=len(df_para_edicao)):
+            df_editado = st.data_editor(
+                df_para_edicao, key="dados_editor", on_change=registrar_previsoes_editadas,
+                use_container_width=True, hide_index=True, disabled=cols_ocultar,
+                column_config={
+                    "Semana_Display": "Semana", 
+                    "Projeto Previsto %": st.column_config.NumberColumn(format="%.0f%%"),
+                    "Fabricação Prevista %": st.column_config.NumberColumn(format="%.0f%%"),
+                    "Montagem Prevista %": st.column_config.NumberColumn(format="%.0f%%"),
+                }
+            )
         st.markdown("---")
 
-    df_calculado = df_editado.copy().sort_values(['Obra', 'Semana'])
-    for col in ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]:
-        df_calculado[col] = df_calculado[col].replace(0.0, np.nan)
-        df_calculado[col] = df_calculado.groupby('Obra')[col].ffill().fillna(0.0)
-        mask_concluido = df_calculado.groupby('Obra')[col].shift(1) >= 100.0
-        df_calculado.loc[mask_concluido, col] = np.nan
+    df_calculado = calcular_previsoes_sessao(df_editado)
 
     if st.button("💾 Salvar Previsões no Banco de Dados", type="primary"):
-        salvar_dados_usuario(df_editado, st.session_state['orcamentos'])
+        salvar_dados_usuario(previsoes_pendentes(df_editado), orcamentos_alterados())
 
     if show_result_table:
         cols_res = ["Obra", "Semana_Display", "Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"]
         st.dataframe(df_calculado[[c for c in cols_res if c in df_calculado.columns]], use_container_width=True, hide_index=True)
 
 # --- ABA 3: GRÁFICOS (MODO SLIDESHOW CORRIGIDO) ---
-with tab_graficos:
+def mudar_slide(passo, total):
+    st.session_state.slide_index = (st.session_state.slide_index + passo) % total
+
+@st.fragment
+@medir("aba", "Gráficos")
+def aba_graficos(df_calculado, versao, obras_selecionadas):
     st.subheader("📈 Tendências e Resumo por Obra")
 
     if not obras_selecionadas:
@@ -461,188 +294,69 @@ with tab_graficos:
         # 2. CONTROLES DE NAVEGAÇÃO
         col_prev, col_title, col_next = st.columns([1, 4, 1])
         
+        # on_click muda o índice antes da reexecução: título, gráfico e resumo mostram a mesma obra
         with col_prev:
-            if st.button("⬅️ Obra Anterior", use_container_width=True):
-                st.session_state.slide_index = (st.session_state.slide_index - 1) % len(obras_selecionadas)
-                
+            st.button("⬅️ Obra Anterior", use_container_width=True, on_click=mudar_slide, args=(-1, len(obras_selecionadas)))
+
         with col_title:
             obra_atual = obras_selecionadas[st.session_state.slide_index]
             st.markdown(f"<h3 style='text-align: center; color: #1f77b4;'>{obra_atual}</h3>", unsafe_allow_html=True)
             st.markdown(f"<p style='text-align: center;'>Mostrando obra <b>{st.session_state.slide_index + 1}</b> de <b>{len(obras_selecionadas)}</b></p>", unsafe_allow_html=True)
             
         with col_next:
-            if st.button("Próxima Obra ➡️", use_container_width=True):
-                st.session_state.slide_index = (st.session_state.slide_index + 1) % len(obras_selecionadas)
+            st.button("Próxima Obra ➡️", use_container_width=True, on_click=mudar_slide, args=(1, len(obras_selecionadas)))
 
         st.markdown("---")
 
-  # 3. RENDERIZAÇÃO DO GRÁFICO 
-        df_obra_chart = df_calculado[df_calculado["Obra"] == obra_atual].copy()
-        
-        if not df_obra_chart.empty:
-            df_melt = df_obra_chart.melt(
-                id_vars=["Obra", "Semana_Display", "Semana"], 
-                value_vars=[c for c in ["Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"] if c in df_obra_chart.columns],
-                var_name="Metrica", # Nome limpo para o Altair ler sem quebrar
-                value_name="Porcentagem"
-            )
-            
-            # CORREÇÃO: Coluna extra criada pelo Pandas para forçar a linha tracejada com segurança
-            df_melt["Status"] = df_melt["Metrica"].apply(lambda x: "Previsão" if "Previst" in x else "Realizado")
-            
-            chart = alt.Chart(df_melt).mark_line(point=True, strokeWidth=3).encode(
-                x=alt.X('Semana_Display:N', sort=alt.SortField(field="Semana", order='ascending'), title='Semana'),
-                y=alt.Y('Porcentagem:Q', title='Avanço (%)'), 
-                color=alt.Color('Metrica:N', scale=alt.Scale(scheme='category10'), title='Métrica'), 
-                # Lemos a coluna Status diretamente. [1, 0] = Linha Sólida | [5, 5] = Linha Tracejada
-                strokeDash=alt.StrokeDash(
-                    'Status:N', 
-                    scale=alt.Scale(domain=["Realizado", "Previsão"], range=[[1, 0], [5, 5]]), 
-                    title='Tipo de Linha'
-                ),
-                tooltip=[
-                    'Obra', 
-                    'Semana_Display', 
-                    alt.Tooltip('Metrica:N', title='Métrica'), 
-                    alt.Tooltip('Porcentagem:Q', format='.1f')
-                ]
-            ).properties(height=350).interactive()
-            
-            st.altair_chart(chart, use_container_width=True)
+        # 3. RENDERIZAÇÃO DO GRÁFICO
+        # Formato longo e spec saem da loja (uma vez por versão dos dados); os vizinhos são pré-montados
+        loja = loja_graficos()
+        spec = loja.spec(versao, df_calculado, obra_atual)
+        if spec is not None:
+            st.vega_lite_chart(spec=spec_para_exibir(spec), use_container_width=True)
+        total = len(obras_selecionadas)
+        vizinhas = {obras_selecionadas[(st.session_state.slide_index + passo) % total] for passo in (-1, 1)}
+        loja.pre_carregar(versao, df_calculado, vizinhas - {obra_atual})
 
         # 4. RENDERIZAÇÃO DA TABELA GERAL (Específica da obra atual)
         st.subheader("📋 Resumo Consolidado da Obra")
         
-        df_geral_slide = carregar_dados_gerais()
-        df_orc_slide = st.session_state['orcamentos'].drop_duplicates(subset=['Obra'], keep='first')
-        
-        df_geral_slide = df_geral_slide[df_geral_slide["Obra"] == obra_atual].copy()
-        
-        if not df_geral_slide.empty:
-            df_geral_slide = df_geral_slide.merge(df_orc_slide, on="Obra", how="left")
-            
-            cols_num = ["Orcamento", "Orcamento Lajes", "Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
-            for col in cols_num: 
-                if col in df_geral_slide.columns: df_geral_slide[col] = df_geral_slide[col].fillna(0.0)
-
-            for etapa in ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]:
-                df_geral_slide[f"{etapa} %"] = df_geral_slide.apply(lambda r: (r[etapa]/r["Orcamento"]*100) if r.get("Orcamento", 0) > 0 else 0, axis=1)
-
-            hoje = pd.to_datetime(datetime.date.today())
-            for col in ["Fim Projeto", "Fim Fabricacao", "Fim Montagem"]:
-                if col not in df_geral_slide.columns: df_geral_slide[col] = None
-                df_geral_slide[col] = pd.to_datetime(df_geral_slide[col], errors='coerce')
-
-            df_geral_slide['Saldo Proj'] = df_geral_slide.apply(lambda r: (r['Fim Projeto'] - hoje).days if pd.notna(r['Fim Projeto']) else None, axis=1)
-            df_geral_slide['Saldo Fab']  = df_geral_slide.apply(lambda r: (r['Fim Fabricacao'] - hoje).days if pd.notna(r['Fim Fabricacao']) else None, axis=1)
-            df_geral_slide['Saldo Mont'] = df_geral_slide.apply(lambda r: (r['Fim Montagem'] - hoje).days if pd.notna(r['Fim Montagem']) else None, axis=1)
-
-            cols_final = [c for c in [
-                "Obra", "Orcamento", "Orcamento Lajes", "Projetado", "Projetado %", "Saldo Proj",
-                "Taxa de Aço", "Fabricado", "Fabricado %", "Saldo Fab", "Acabado", "Acabado %",
-                "Expedido", "Expedido %", "Montado", "Montado %", "Saldo Mont"
-            ] if c in df_geral_slide.columns]
+        hoje = pd.to_datetime(datetime.date.today())
+        df_kpis = kpis_obras(dados_gerais_da_sessao(), orcamentos_da_sessao(), hoje)
+        df_geral_slide = df_kpis[df_kpis["Obra"] == obra_atual]
 
-            st.dataframe(
-                df_geral_slide[cols_final], use_container_width=True, hide_index=True,
-                column_config={
-                    "Orcamento": st.column_config.NumberColumn("Orçamento", format="%.2f"),
-                    "Orcamento Lajes": st.column_config.NumberColumn("Orç. Lajes", format="%.2f"),
-                    "Taxa de Aço": st.column_config.NumberColumn("Aço (kg/m³)", format="%.2f"),
-                    "Projetado": st.column_config.NumberColumn("Vol. Proj.", format="%.2f"),
-                    "Projetado %": st.column_config.NumberColumn("Proj. %", format="%.1f%%"), 
-                    "Saldo Proj": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                    "Fabricado": st.column_config.NumberColumn("Vol. Fab.", format="%.2f"),
-                    "Fabricado %": st.column_config.NumberColumn("Fab. %", format="%.1f%%"),
-                    "Saldo Fab": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                    "Montado": st.column_config.NumberColumn("Vol. Mont.", format="%.2f"),
-                    "Montado %": st.column_config.NumberColumn("Mont. %", format="%.1f%%"),
-                    "Saldo Mont": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                    "Acabado": st.column_config.NumberColumn("Vol. Acab.", format="%.2f"),
-                    "Acabado %": st.column_config.NumberColumn("Acab. %", format="%.1f%%"),
-                    "Expedido": st.column_config.NumberColumn("Vol. Exp.", format="%.2f"),
-                    "Expedido %": st.column_config.NumberColumn("Exp. %", format="%.1f%%"),
-                }
-            )
+        if not df_geral_slide.empty:
+            st.dataframe(df_geral_slide, use_container_width=True, hide_index=True, column_config=CONFIG_COLUNAS_KPI)
 
 # --- ABA 4: TABELA GERAL ---
-with tab_geral:
+@st.fragment
+@medir("aba", "Tabela Geral")
+def aba_geral(carga):
     st.subheader("🏗️ Resumo Geral Detalhado")
     try:
-        df_geral = carregar_dados_gerais()
-        df_orc_clean = st.session_state['orcamentos'].drop_duplicates(subset=['Obra'], keep='first')
-        df_geral = df_geral.merge(df_orc_clean, on="Obra", how="left")
-
-        cols_num = ["Orcamento", "Orcamento Lajes", "Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
-        for col in cols_num: 
-            if col in df_geral.columns: df_geral[col] = df_geral[col].fillna(0.0)
-
-        for etapa in ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]:
-            df_geral[f"{etapa} %"] = df_geral.apply(lambda r: (r[etapa]/r["Orcamento"]*100) if r["Orcamento"]>0 else 0, axis=1)
-
         hoje = pd.to_datetime(datetime.date.today())
-        cols_fim = ["Fim Projeto", "Fim Fabricacao", "Fim Montagem"]
-        
-        for col in cols_fim:
-            if col not in df_geral.columns: df_geral[col] = None
-            df_geral[col] = pd.to_datetime(df_geral[col], errors='coerce')
-
-        def calc_saldo(row, col_prazo):
-            if pd.isna(row[col_prazo]): return None
-            return (row[col_prazo] - hoje).days
-
-        df_geral['Saldo Proj'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Projeto'), axis=1)
-        df_geral['Saldo Fab'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Fabricacao'), axis=1)
-        df_geral['Saldo Mont'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Montagem'), axis=1)
-
-        colunas_ordenadas = [
-            "Obra", "Orcamento", "Orcamento Lajes",
-            "Projetado", "Projetado %", "Saldo Proj",
-            "Taxa de Aço",
-            "Fabricado", "Fabricado %", "Saldo Fab",
-            "Acabado", "Acabado %",
-            "Expedido", "Expedido %",
-            "Montado", "Montado %", "Saldo Mont"
-        ]
-        
-        cols_final = [c for c in colunas_ordenadas if c in df_geral.columns]
-
-        st.dataframe(
-            df_geral[cols_final], use_container_width=True, hide_index=True,
-            column_config={
-                "Orcamento": st.column_config.NumberColumn("Orçamento", format="%.2f"),
-                "Orcamento Lajes": st.column_config.NumberColumn("Orç. Lajes", format="%.2f"),
-                "Taxa de Aço": st.column_config.NumberColumn("Aço (kg/m³)", format="%.2f"),
-                "Projetado": st.column_config.NumberColumn("Vol. Proj.", format="%.2f"),
-                "Projetado %": st.column_config.NumberColumn("Proj. %", format="%.1f%%"), 
-                "Saldo Proj": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                "Fabricado": st.column_config.NumberColumn("Vol. Fab.", format="%.2f"),
-                "Fabricado %": st.column_config.NumberColumn("Fab. %", format="%.1f%%"),
-                "Saldo Fab": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                "Montado": st.column_config.NumberColumn("Vol. Mont.", format="%.2f"),
-                "Montado %": st.column_config.NumberColumn("Mont. %", format="%.1f%%"),
-                "Saldo Mont": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
-                "Acabado": st.column_config.NumberColumn("Vol. Acab.", format="%.2f"),
-                "Acabado %": st.column_config.NumberColumn("Acab. %", format="%.1f%%"),
-                "Expedido": st.column_config.NumberColumn("Vol. Exp.", format="%.2f"),
-                "Expedido %": st.column_config.NumberColumn("Exp. %", format="%.1f%%"),
-            }
-        )
+        df_geral = kpis_obras(dados_gerais_da_sessao(), orcamentos_da_sessao(), hoje)
+        if filtro_no_banco:
+            st.caption("Mostrando só as obras do filtro global (consulta filtrada no banco).")
+        st.dataframe(df_geral, use_container_width=True, hide_index=True, column_config=CONFIG_COLUNAS_KPI)
         st.markdown('---')
         st.subheader('📅 War Room Semanal')
         try:
-            data_week = carregar_war_room_week()
-            if data_week:
+            data_week = carga.obter("war_room_semanal")
+            if carga.pendente("war_room_semanal"):
+                st.info('⏳ War Room Semanal ainda carregando...')
+            elif data_week:
                 df_week = pd.DataFrame(data_week)
                 needed = {'inicio','fim','setor','total_programado','total_realizado'}
                 if needed.issubset(df_week.columns):
-                    df_week['Datas'] = pd.to_datetime(df_week['inicio']).dt.strftime('%d/%m') + ' a ' + pd.to_datetime(df_week['fim']).dt.strftime('%d/%m')
+                    df_week['Datas'] = rotular_intervalos(df_week['inicio'], df_week['fim'])
                     df_week = df_week[['Datas','setor','total_programado','total_realizado']].rename(columns={
                         'setor': 'Setor',
                         'total_programado': 'Total Programado',
                         'total_realizado': 'Total Realizado',
                     })
                 st.dataframe(df_week, use_container_width=True, hide_index=True)
+                st.caption(legenda_idade(cliente_war_room_week()))
             else:
                 st.info('Sem dados semanais.')
         except Exception as e:
@@ -652,12 +366,14 @@ with tab_geral:
         st.error(f"Erro ao gerar tabela: {e}")
 
 # --- ABA 5: PLANEJADOR ---
-with tab_planejador:
+@st.fragment
+@medir("aba", "Planejador")
+def aba_planejador():
     st.subheader("📅 Planejador de Obra")
     st.info("Simule uma nova obra usando a estrutura de datas de uma obra existente OU a média geral.")
 
     col_plan1, col_plan2, col_plan3 = st.columns([1, 1, 1])
-    opcoes_referencia = ["Média Geral (Todas as Obras)"] + sorted(todas_obras_lista)
+    opcoes_referencia = [MEDIA_GERAL] + sorted(todas_obras_lista)
     with col_plan1: obra_referencia = st.selectbox("Base de Referência:", options=opcoes_referencia)
     with col_plan2: data_inicio_simulacao = st.date_input("Início da Simulação:", value=datetime.date.today())
     with col_plan3:
@@ -681,94 +397,96 @@ with tab_planejador:
     total_qtd_input = df_familias_input['Quantidade'].sum()
     total_vol_input = df_familias_input['Volume'].sum()
     st.metric("Volume Total Planejado", f"{total_vol_input:.2f} m³")
+    usar_curvas = st.toggle("Distribuir o volume pelas curvas históricas das famílias (curva S)", value=True)
 
     st.markdown("---")
     
-    if st.button("Gerar Projeção de Cronograma", type="primary"):
+    c_gerar, c_comparar, c_risco, c_cenarios = st.columns([1, 1, 1, 1])
+    with c_gerar: gerar = st.button("Gerar Projeção de Cronograma", type="primary")
+    with c_comparar: comparar = st.button("Comparar Todas as Referências")
+    with c_risco: risco = st.button("Simular Risco (Monte Carlo)")
+    with c_cenarios: n_cenarios = st.number_input("Cenários", min_value=10_000, max_value=1_000_000, value=CENARIOS_PADRAO, step=10_000)
+
+    curvas = None
+    if usar_curvas and (gerar or comparar or risco):
         try:
-            datas = None
-            if obra_referencia == "Média Geral (Todas as Obras)":
-                df_medias = calcular_medias_cronograma()
-                if not df_medias.empty:
-                    media = df_medias.iloc[0]
-                    ini_p = pd.to_datetime(data_inicio_simulacao)
-                    fim_p = ini_p + pd.Timedelta(days=media['dias_duracao_proj'])
-                    ini_f = ini_p + pd.Timedelta(days=media['dias_lag_fab'])
-                    fim_f = ini_f + pd.Timedelta(days=media['dias_duracao_fab'])
-                    ini_m = ini_p + pd.Timedelta(days=media['dias_lag_mont'])
-                    fim_m = ini_m + pd.Timedelta(days=media['dias_duracao_mont'])
-                    datas = {'ini_proj': ini_p, 'fim_proj': fim_p, 'ini_fab': ini_f, 'fim_fab': fim_f, 'ini_mont': ini_m, 'fim_mont': fim_m}
-                else: st.error("Dados insuficientes.")
+            # Curvas S por família e etapa, pré-calculadas por versão dos dados; aqui só a média ponderada
+            curvas = combinar_curvas(carregar_curvas_familias(), df_familias_input)
+        except Exception as e:
+            st.warning(f"Curvas das famílias indisponíveis, usando distribuição linear: {e}")
+
+    if risco:
+        try:
+            # Durações e defasagens de cada obra do histórico (as mesmas que viram a Média Geral)
+            perfis = perfis_historicos(carregar_datas_limite_obras())
+            df_percentis, df_leque, segundos = simular_risco(perfis, data_inicio_simulacao, total_vol_input, int(n_cenarios), curvas)
+            st.subheader("Risco de Prazo (Monte Carlo)")
+            st.caption(f"{int(n_cenarios):,} cenários a partir de {len(perfis)} obras do histórico em {segundos * 1000:.0f} ms".replace(",", "."))
+            st.dataframe(
+                df_percentis, use_container_width=True, hide_index=True,
+                column_config={f"P{p}": st.column_config.DateColumn(f"Fim P{p}", format="DD/MM/YYYY") for p in PERCENTIS}
+            )
+            st.altair_chart(grafico_leque(df_leque), use_container_width=True)
+        except Exception as e:
+            st.error(f"Erro: {e}")
+
+    if gerar or comparar:
+        try:
+            # Um perfil (durações e defasagens) por referência; todas rodam numa só chamada do motor
+            perfis = perfis_das_obras(carregar_datas_limite_obras().reindex(sorted(todas_obras_lista)))
+            df_medias = calcular_medias_cronograma()
+            if not df_medias.empty:
+                perfis.loc[MEDIA_GERAL] = df_medias.iloc[0][perfis.columns]
+            perfis = perfis.dropna(how='all')
+            if not comparar:
+                perfis = perfis.loc[perfis.index.intersection([obra_referencia])]
+
+            inicio = pd.to_datetime(data_inicio_simulacao)
+            df_cenarios = projetar_cenarios(perfis, inicio, total_vol_input, curvas)
+
+            if df_cenarios.empty:
+                st.warning("Não foi possível gerar cronograma.")
+            elif comparar:
+                st.subheader("Comparação entre Referências")
+                st.dataframe(resumir_cenarios(perfis, inicio).sort_values("Fim Montagem"), use_container_width=True, hide_index=True)
+                st.write("**Montagem acumulada (m³) por referência:**")
+                st.line_chart(df_cenarios.pivot(index='Semana', columns='Cenario', values='Montagem (Vol)').ffill())
             else:
-                df_datas = carregar_datas_limite_etapas(obra_referencia)
-                if not df_datas.empty and not df_datas.iloc[0].isnull().all():
-                    raw = df_datas.iloc[0]
-                    dur_p = (raw['fim_proj'] - raw['ini_proj']).days
-                    lag_f = (raw['ini_fab'] - raw['ini_proj']).days
-                    dur_f = (raw['fim_fab'] - raw['ini_fab']).days
-                    lag_m = (raw['ini_mont'] - raw['ini_proj']).days
-                    dur_m = (raw['fim_mont'] - raw['ini_mont']).days
-                    
-                    ini_p = pd.to_datetime(data_inicio_simulacao)
-                    datas = {
-                        'ini_proj': ini_p, 'fim_proj': ini_p + pd.Timedelta(days=dur_p),
-                        'ini_fab': ini_p + pd.Timedelta(days=lag_f), 'fim_fab': (ini_p + pd.Timedelta(days=lag_f)) + pd.Timedelta(days=dur_f),
-                        'ini_mont': ini_p + pd.Timedelta(days=lag_m), 'fim_mont': (ini_p + pd.Timedelta(days=lag_m)) + pd.Timedelta(days=dur_m)
-                    }
-            
-            if datas:
-                def gerar_semanas(inicio, fim):
-                    if pd.isna(inicio) or pd.isna(fim): return []
-                    start = pd.to_datetime(inicio) - pd.Timedelta(days=pd.to_datetime(inicio).weekday())
-                    end = pd.to_datetime(fim)
-                    weeks = []
-                    while start <= end:
-                        weeks.append(start)
-                        start += pd.Timedelta(days=7)
-                    return weeks
-
-                semanas_proj = gerar_semanas(datas['ini_proj'], datas['fim_proj'])
-                semanas_fab = gerar_semanas(datas['ini_fab'], datas['fim_fab'])
-                semanas_mont = gerar_semanas(datas['ini_mont'], datas['fim_mont'])
-                
-                todas_semanas = sorted(list(set(semanas_proj + semanas_fab + semanas_mont)))
-                df_plan = pd.DataFrame({'Semana': todas_semanas})
-                df_plan['Semana Display'] = df_plan['Semana'].apply(formatar_semana)
-                
-                vp = total_vol_input / len(semanas_proj) if semanas_proj else 0
-                vf = total_vol_input / len(semanas_fab) if semanas_fab else 0
-                vm = total_vol_input / len(semanas_mont) if semanas_mont else 0
-                
-                qp = total_qtd_input / len(semanas_proj) if semanas_proj else 0
-                qf = total_qtd_input / len(semanas_fab) if semanas_fab else 0
-                qm = total_qtd_input / len(semanas_mont) if semanas_mont else 0
-                
-                df_plan['Projeto (Vol)'] = df_plan['Semana'].apply(lambda x: vp if x in semanas_proj else 0).cumsum()
-                df_plan['Fabricação (Vol)'] = df_plan['Semana'].apply(lambda x: vf if x in semanas_fab else 0).cumsum()
-                df_plan['Montagem (Vol)'] = df_plan['Semana'].apply(lambda x: vm if x in semanas_mont else 0).cumsum()
-                
+                df_plan = df_cenarios.drop(columns='Cenario')
+                df_plan.insert(1, 'Semana Display', rotular_semanas(df_plan['Semana']))
                 st.subheader("Simulação de Avanço Acumulado")
                 st.dataframe(df_plan, use_container_width=True, hide_index=True)
-            else:
-                st.warning("Não foi possível gerar cronograma.")
         except Exception as e:
             st.error(f"Erro: {e}")
 
 # --- ABA 6: WAR ROOM ---
-with tab_warroom:
+# O fragmento se reexecuta sozinho e relê o snapshot do poller (sem I/O): a TV da fábrica fica atualizada
+@st.fragment(run_every=10)
+@medir("aba", "War Room")
+def aba_war_room(carga):
     st.subheader("🏗️ War Room Produção")
     st.caption(f"Data: {datetime.date.today().strftime('%d/%m/%Y')} | Fonte: API War Room")
 
     c1, c2 = st.columns([1, 1])
     with c1:
-        if st.button("🔄 Atualizar agora", key="btn_war_room_refresh"):
-            carregar_war_room.clear()
-            st.rerun() # CORRIGIDO AQUI DE experimental_rerun PARA rerun
+        # Se o poller já estiver buscando, o clique espera por essa busca em vez de abrir outra
+        atualizar = st.button("🔄 Atualizar agora", key="btn_war_room_refresh")
     with c2:
         st.write("")
 
     try:
-        data_wr = carregar_war_room()
+        # A carga inicial só vale enquanto a busca dela não terminou; depois (inclusive nas
+        # reexecuções a cada 10 s, que recebem a mesma carga) a leitura é sempre do poller,
+        # o que também o mantém acordado
+        if atualizar:
+            data_wr = cliente_war_room().atualizar_agora()
+        elif carga.pendente("war_room"):
+            data_wr = None
+        else:
+            data_wr = cliente_war_room().obter()
+        if data_wr is None:
+            st.info("⏳ A API do War Room ainda não respondeu. Clique em **Atualizar agora** em instantes.")
+            return
         now = datetime.datetime.now()
         current_hour = now.hour
 
@@ -816,6 +534,65 @@ with tab_warroom:
             return styles
 
         st.dataframe(df_wr.style.apply(style_row, axis=1), use_container_width=True, hide_index=True)
-        st.caption(f"Atualizado em: {now.strftime('%H:%M:%S')}")
+        st.caption(f"Atualizado em: {now.strftime('%H:%M:%S')} | {legenda_idade(cliente_war_room())}")
     except Exception as e:
         st.error(f"Erro ao carregar War Room: {e}")
+
+# --- ABA 7: DIAGNÓSTICO (SÓ COM ?diagnostico=<senha>) ---
+def aba_diagnostico(carga):
+    st.subheader("🩺 Diagnóstico")
+    df_eventos = registro_diagnostico().frame()
+    st.caption(f"{len(df_eventos)} eventos no buffer deste processo (log completo em JSON-lines no servidor).")
+
+    st.write("**Tempos por loader, etapa, aba e rerun:**")
+    st.dataframe(resumo_tempos(df_eventos), use_container_width=True, hide_index=True, column_config={
+        c: st.column_config.NumberColumn(format="%.1f") for c in ["p50 (ms)", "p95 (ms)", "Máx (ms)", "Hit (%)", "MB"]
+    })
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.write("**Carga inicial desta execução (ms):**")
+        st.dataframe(pd.DataFrame({"Fonte": list(carga.latencias), "ms": [s * 1000 for s in carga.latencias.values()]}), hide_index=True, use_container_width=True)
+        st.write("**Memória da sessão por etapa:**")
+        st.dataframe(tabela_memoria(), hide_index=True, use_container_width=True)
+    with c2:
+        st.write("**Pool de conexões do MySQL:**")
+        try:
+            st.json(banco.metricas_pool())
+        except Exception as e:
+            st.error(f"Pool indisponível: {e}")
+
+    st.write("**Últimos eventos:**")
+    st.dataframe(df_eventos.tail(200).iloc[::-1], use_container_width=True, hide_index=True)
+
+# --- 7. EXECUÇÃO DA ABA ATIVA ---
+aba_ativa = st.radio("Aba", ABAS, key="aba_ativa", horizontal=True, label_visibility="collapsed")
+
+if aba_ativa == "📁 Cadastro":
+    aba_cadastro(obras_selecionadas)
+elif aba_ativa == "📊 Tabelas":
+    aba_tabelas(preparar_dados_semanais(obras_selecionadas, data_inicio, data_fim))
+elif aba_ativa == "📈 Gráficos":
+    # Calculado fora do fragmento: a navegação entre obras reaproveita o mesmo frame e a
+    # mesma versão (chave da loja de gráficos), sem refazer o hash a cada clique
+    df_para_edicao = aplicar_previsoes_editadas(
+        preparar_dados_semanais(obras_selecionadas, data_inicio, data_fim), st.session_state.get('previsoes_editadas')
+    )
+    df_calculado = calcular_previsoes_sessao(df_para_edicao)
+    aba_graficos(df_calculado, versao_frame(df_calculado), obras_selecionadas)
+elif aba_ativa == "🌍 Tabela Geral":
+    aba_geral(carga)
+elif aba_ativa == "📅 Planejador":
+    aba_planejador()
+elif aba_ativa == "🏗️ War Room":
+    aba_war_room(carga)
+elif aba_ativa == "🩺 Diagnóstico":
+    aba_diagnostico(carga)
+
+# --- MEMÓRIA DA SESSÃO (por etapa do pipeline) ---
+with st.expander(f"🧠 Memória da sessão: {bytes_sessao() / 2**20:.1f} MB de {LIMITE_MEMORIA_SESSAO_MB:.0f} MB"):
+    st.caption(f"Base compartilhada entre as sessões (não conta no limite): {(medir_bytes(base.semanal) + medir_bytes(base.df_base)) / 2**20:.1f} MB")
+    st.dataframe(tabela_memoria(), hide_index=True, use_container_width=True, column_config={"MB": st.column_config.NumberColumn(format="%.2f")})
+
+registrar_etapas_sessao()
+registrar_evento("rerun", aba_ativa, (time.perf_counter() - inicio_rerun) * 1000)
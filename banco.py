@@ -0,0 +1,235 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import URL
+
+# ========================================================
+#           CONFIGURAÇÕES DO BANCO DE DADOS
+# ========================================================
+DB_URL = URL.create(
+    "mysql+mysqlconnector",
+    username=st.secrets["db_user"],
+    password=st.secrets["db_password"],
+    host=st.secrets["db_host"],
+    port=3306,
+    database=st.secrets["db_name"],
+)
+
+# Limites do pool (por processo). Somados entre réplicas devem ficar abaixo do max_connections do MySQL.
+POOL_SIZE = int(st.secrets.get("db_pool_size", 5))
+POOL_MAX_OVERFLOW = int(st.secrets.get("db_pool_max_overflow", 5))
+POOL_TIMEOUT = 30        # segundos esperando uma conexão livre antes de falhar
+POOL_RECYCLE = 1800      # recicla antes do wait_timeout do servidor derrubar a conexão
+
+# ========================================================
+#           MÉTRICAS DO POOL
+# ========================================================
+class MetricasPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conexoes_criadas = 0
+        self.checkouts = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.falhas = 0
+
+    def registrar_espera(self, segundos):
+        with self.lock:
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+
+    def resumo(self):
+        with self.lock:
+            return {
+                "conexoes_criadas": self.conexoes_criadas,
+                "checkouts": self.checkouts,
+                "em_uso": self.em_uso,
+                "pico_em_uso": self.pico_em_uso,
+                "espera_media_ms": (self.espera_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "espera_max_ms": self.espera_max * 1000,
+                "falhas": self.falhas,
+            }
+
+METRICAS = MetricasPool()
+
+def _registrar_eventos(engine, metricas):
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(dbapi_conn, registro):
+        with metricas.lock:
+            metricas.conexoes_criadas += 1
+
+    @event.listens_for(engine, "checkout")
+    def _ao_retirar(dbapi_conn, registro, proxy):
+        with metricas.lock:
+            metricas.checkouts += 1
+            metricas.em_uso += 1
+            metricas.pico_em_uso = max(metricas.pico_em_uso, metricas.em_uso)
+
+    @event.listens_for(engine, "checkin")
+    def _ao_devolver(dbapi_conn, registro):
+        with metricas.lock:
+            metricas.em_uso = max(metricas.em_uso - 1, 0)
+
+# ========================================================
+#     ENGINE COMPARTILHADO (UM POR PROCESSO)
+# ========================================================
+@st.cache_resource
+def obter_engine():
+    engine = create_engine(
+        DB_URL,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    _registrar_eventos(engine, METRICAS)
+    return engine
+
+def metricas_pool():
+    resumo = METRICAS.resumo()
+    resumo["status"] = obter_engine().pool.status()
+    return resumo
+
+@contextmanager
+def conexao():
+    engine = obter_engine()
+    inicio = time.perf_counter()
+    try:
+        conn = engine.connect()
+    except Exception:
+        with METRICAS.lock:
+            METRICAS.falhas += 1
+        raise
+    # Inclui a fila do pool e, quando não há conexão ociosa, o handshake de uma nova
+    METRICAS.registrar_espera(time.perf_counter() - inicio)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def transacao():
+    with conexao() as conn:
+        with conn.begin():
+            yield conn
+
+def ler_sql(query, params=None):
+    with conexao() as conn:
+        return pd.read_sql(query, conn, params=params)
+
+# ========================================================
+#     TABELAS DO USUÁRIO (ESQUEMA COM CHAVES)
+# ========================================================
+COLUNAS_PREVISOES = ["Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]
+COLUNAS_ORCAMENTOS = [
+    "Obra", "Orcamento", "Orcamento Lajes",
+    "Ini Projeto", "Fim Projeto", "Ini Fabricacao", "Fim Fabricacao", "Ini Montagem", "Fim Montagem",
+]
+COLUNAS_DATA_ORCAMENTOS = COLUNAS_ORCAMENTOS[3:]
+
+TABELAS_USUARIO = {
+    "previsoes_usuario": {
+        "chaves": ["Obra", "Semana"],
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS `previsoes_usuario` (
+                `Obra` VARCHAR(255) NOT NULL,
+                `Semana` DATE NOT NULL,
+                `Projeto Previsto %` DOUBLE NULL,
+                `Fabricação Prevista %` DOUBLE NULL,
+                `Montagem Prevista %` DOUBLE NULL,
+                PRIMARY KEY (`Obra`, `Semana`)
+            )
+        """,
+        "colunas": COLUNAS_PREVISOES,
+        "datas": ["Semana"],
+    },
+    "orcamentos_usuario": {
+        "chaves": ["Obra"],
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS `orcamentos_usuario` (
+                `Obra` VARCHAR(255) NOT NULL,
+                `Orcamento` DOUBLE NULL,
+                `Orcamento Lajes` DOUBLE NULL,
+                `Ini Projeto` DATE NULL, `Fim Projeto` DATE NULL,
+                `Ini Fabricacao` DATE NULL, `Fim Fabricacao` DATE NULL,
+                `Ini Montagem` DATE NULL, `Fim Montagem` DATE NULL,
+                PRIMARY KEY (`Obra`)
+            )
+        """,
+        "colunas": COLUNAS_ORCAMENTOS,
+        "datas": COLUNAS_DATA_ORCAMENTOS,
+    },
+}
+
+def _nome_livre(inspetor, nome):
+    livre, n = nome, 1
+    while inspetor.has_table(livre):
+        n += 1
+        livre = f"{nome}{n}"
+    return livre
+
+def _migrar_tabela_legada(conn, tabela, definicao):
+    # Tabelas antigas vinham do to_sql(if_exists='replace'): sem chave e com colunas TEXT.
+    # DDL no MySQL não entra na transação: os dados são copiados (última linha vence) para
+    # uma tabela nova ao lado e só depois de a cópia terminar um único RENAME TABLE troca
+    # as duas, de forma atômica. Se algo falhar antes, a antiga segue no lugar e a migração
+    # é refeita na próxima execução; a antiga fica preservada como <tabela>_legado.
+    inspetor = inspect(conn)
+    novo = f"{tabela}_novo"
+    legado = _nome_livre(inspetor, f"{tabela}_legado")
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS `{novo}`")  # sobra de uma tentativa interrompida
+    conn.exec_driver_sql(definicao["ddl"].replace(f"`{tabela}`", f"`{novo}`", 1))
+    existentes = {c["name"] for c in inspetor.get_columns(tabela)}
+    colunas = [c for c in definicao["colunas"] if c in existentes]
+    selecao = ", ".join(f"CAST(`{c}` AS DATE)" if c in definicao["datas"] else f"`{c}`" for c in colunas)
+    filtro = " AND ".join(f"`{c}` IS NOT NULL" for c in definicao["chaves"])
+    atualiza = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in colunas if c not in definicao["chaves"])
+    conn.exec_driver_sql(
+        f"INSERT INTO `{novo}` ({', '.join(f'`{c}`' for c in colunas)}) "
+        f"SELECT {selecao} FROM `{tabela}` WHERE {filtro} "
+        f"ON DUPLICATE KEY UPDATE {atualiza}"
+    )
+    conn.exec_driver_sql(f"RENAME TABLE `{tabela}` TO `{legado}`, `{novo}` TO `{tabela}`")
+
+@st.cache_resource
+def garantir_tabelas_usuario():
+    with transacao() as conn:
+        inspetor = inspect(conn)
+        for tabela, definicao in TABELAS_USUARIO.items():
+            if not inspetor.has_table(tabela):
+                conn.exec_driver_sql(definicao["ddl"])
+            elif not inspetor.get_pk_constraint(tabela)["constrained_columns"]:
+                _migrar_tabela_legada(conn, tabela, definicao)
+    return True
+
+# ========================================================
+#     UPSERT EM LOTE (INSERT ... ON DUPLICATE KEY UPDATE)
+# ========================================================
+def _valor_nativo(valor):
+    # O conector não converte tipos do numpy/pandas
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if hasattr(valor, "item"):
+        return valor.item()
+    return valor
+
+def upsert(conn, tabela, df, chaves):
+    if df.empty:
+        return 0
+    colunas = list(df.columns)
+    nomes = ", ".join(f"`{c}`" for c in colunas)
+    marcadores = ", ".join(["%s"] * len(colunas))
+    atualiza = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in colunas if c not in chaves)
+    query = f"INSERT INTO `{tabela}` ({nomes}) VALUES ({marcadores}) ON DUPLICATE KEY UPDATE {atualiza}"
+    linhas = [tuple(_valor_nativo(v) for v in linha) for linha in df.itertuples(index=False, name=None)]
+    conn.exec_driver_sql(query, linhas)
+    return len(linhas)
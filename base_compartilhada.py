@@ -0,0 +1,118 @@
+import itertools
+
+import pandas as pd
+import streamlit as st
+
+import banco
+from diagnostico import loader_medido
+from carregamento import TTL_DADOS, MAX_FILTROS_EM_CACHE, LIMPEZAS_APOS_REVALIDAR, COLS_DATAS, carregar_dados, carregar_dados_usuario
+from preparacao import montar_acumulado_semanal, COLS_PREVISAO
+from semanas import rotular_semanas
+
+COLS_REMOVER_ORCAMENTO = ["Prazo Projeto", "Prazo Fabricacao", "Prazo Montagem", "Data Inicio"]
+DEFAULTS_ORCAMENTO = {'Orcamento': 100.0, 'Orcamento Lajes': 0.0}
+
+# ========================================================
+#     BASE COMPARTILHADA (UMA POR PROCESSO)
+# ========================================================
+# O semanal completo (todas as obras, com lacunas preenchidas, acumulado, rótulo da
+# semana e previsões salvas) e o cadastro salvo são montados uma vez por processo e
+# lidos por todas as sessões. Com o Copy-on-Write do pandas os frames são somente
+# leitura na prática: filtros e merges de uma sessão nunca alteram a base.
+def montar_orcamentos_base(obras, df_orcamentos_salvos):
+    df = pd.DataFrame({"Obra": obras}).merge(df_orcamentos_salvos, on="Obra", how="left")
+    df = df.drop(columns=[c for c in COLS_REMOVER_ORCAMENTO if c in df.columns])
+    for col in banco.COLUNAS_DATA_ORCAMENTOS:
+        df[col] = pd.to_datetime(df[col], errors='coerce') if col in df.columns else pd.NaT
+    for col, val in DEFAULTS_ORCAMENTO.items():
+        df[col] = df[col].fillna(val) if col in df.columns else val
+    return df
+
+class BaseCompartilhada:
+    # Versão crescente por base montada no processo (chave do motor de previsões)
+    _versoes = itertools.count(1)
+
+    def __init__(self, df_base, df_orcamentos_salvos, df_previsoes_salvas):
+        self.versao = next(BaseCompartilhada._versoes)
+        self.df_base = df_base
+        self.obras = df_base["Obra"].unique().tolist()
+        self.orcamentos = montar_orcamentos_base(self.obras, df_orcamentos_salvos)
+
+        semanal = montar_acumulado_semanal(df_base, self.obras, semanas_margem=10)
+        semanal['Semana_Display'] = rotular_semanas(semanal['Semana'])
+        if not df_previsoes_salvas.empty:
+            previsoes = df_previsoes_salvas.astype({'Obra': semanal['Obra'].dtype})
+            semanal = semanal.merge(previsoes[['Obra', 'Semana'] + COLS_PREVISAO], on=["Obra", "Semana"], how="left")
+        for col in COLS_PREVISAO:
+            semanal[col] = semanal[col].fillna(0.0) if col in semanal.columns else 0.0
+        self.semanal = semanal
+
+@loader_medido(st.cache_resource(ttl=TTL_DADOS))
+def carregar_base_compartilhada():
+    df_orcamentos_salvos, df_previsoes_salvas = carregar_dados_usuario()
+    return BaseCompartilhada(carregar_dados(), df_orcamentos_salvos, df_previsoes_salvas)
+
+# Mesma base, montada só com as obras e o período de um filtro (ver chave_filtro):
+# usada quando a seleção é pequena e não compensa carregar o histórico de todas
+@loader_medido(st.cache_resource(ttl=TTL_DADOS, max_entries=MAX_FILTROS_EM_CACHE))
+def carregar_base_filtrada(obras, semana_inicio, semana_fim):
+    df_orcamentos_salvos, df_previsoes_salvas = carregar_dados_usuario()
+    return BaseCompartilhada(carregar_dados(obras, semana_inicio, semana_fim), df_orcamentos_salvos, df_previsoes_salvas)
+
+LIMPEZAS_APOS_REVALIDAR.extend([carregar_base_compartilhada.clear, carregar_base_filtrada.clear])
+
+# ========================================================
+#     RECORTE SEMANAL (PAINEL E EXPORTAÇÃO DO DECK)
+# ========================================================
+# Obras e período escolhidos, com o cadastro aplicado e os percentuais realizados.
+# O painel passa o cadastro da sessão; a exportação em lote, o cadastro salvo.
+def recortar_semanal(semanal, df_orcamentos, obras, data_inicio, data_fim):
+    df = semanal[semanal['Obra'].isin(obras) & (semanal["Semana"] >= data_inicio) & (semanal["Semana"] <= data_fim)]
+
+    # Chaves com o mesmo dtype categórico do semanal, para o merge não voltar Obra a string
+    df = df.merge(df_orcamentos.astype({'Obra': df['Obra'].dtype}), on="Obra", how="left")
+    for col in ["Projetado", "Fabricado", "Montado"]:
+        df[f"{col} %"] = ((df[f"Volume_{col}"] / df["Orcamento"]) * 100).astype('float32')
+
+    # Previsões por último, na mesma ordem de colunas de antes
+    return df[[c for c in df.columns if c not in COLS_PREVISAO] + COLS_PREVISAO]
+
+# ========================================================
+#     EDIÇÕES DA SESSÃO (CAMADA ESPARSA SOBRE A BASE)
+# ========================================================
+# A sessão guarda só o que o usuário alterou: {obra: {coluna: valor}} no cadastro e
+# {(obra, semana): {coluna: valor}} nas previsões. A visão da sessão é montada na hora
+# de renderizar, aplicando essas edições sobre a base compartilhada.
+def aplicar_orcamentos_editados(df_orcamentos, editados):
+    if not editados:
+        return df_orcamentos
+    df = df_orcamentos.copy()
+    posicoes = pd.Index(df['Obra']).get_indexer(list(editados))
+    for (obra, mudancas), pos in zip(editados.items(), posicoes):
+        if pos < 0: continue
+        for col_name, new_value in mudancas.items():
+            if col_name in banco.COLUNAS_DATA_ORCAMENTOS:
+                new_value = pd.to_datetime(new_value, errors='coerce')
+            df.iloc[pos, df.columns.get_loc(col_name)] = new_value
+    return df
+
+def preencher_datas_reais(df_orcamentos, df_datas_unificadas):
+    # Ini/Fim em branco no cadastro mostram o início/fim real da etapa (índice de etapas).
+    # Só para exibir: o cadastro da sessão continua vazio até o usuário editar a célula.
+    df = df_orcamentos.copy()
+    reais = df_datas_unificadas.reindex(df['Obra'])
+    for col, col_real in zip(banco.COLUNAS_DATA_ORCAMENTOS, COLS_DATAS):
+        df[col] = df[col].fillna(pd.Series(reais[col_real].dt.normalize().to_numpy(), index=df.index))
+    return df
+
+def aplicar_previsoes_editadas(df, editadas):
+    if not editadas:
+        return df
+    df = df.copy()
+    chaves = list(editadas)
+    posicoes = pd.MultiIndex.from_frame(df[['Obra', 'Semana']]).get_indexer(chaves)
+    for chave, pos in zip(chaves, posicoes):
+        if pos < 0: continue
+        for col_name, new_value in editadas[chave].items():
+            df.iloc[pos, df.columns.get_loc(col_name)] = new_value
+    return df
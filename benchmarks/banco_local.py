@@ -0,0 +1,158 @@
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import banco
+import carregamento
+import diagnostico
+import snapshots
+
+# ========================================================
+#     BANCO LOCAL (SUBSTITUTO DO MYSQL NOS BENCHMARKS)
+# ========================================================
+# Serve a extração compacta a partir das linhas sintéticas do plannix, com o mesmo
+# agrupamento da QUERY_EXTRACAO feito em pandas, e as tabelas do usuário em memória.
+# instalar() troca só os pontos de acesso ao banco (conexão, leituras e watermark);
+# todo o resto do pipeline roda sem alteração. latencia_s simula a ida e volta da rede.
+def _semana(datas):
+    # CAST(DATE_SUB(d, INTERVAL WEEKDAY(d) DAY) AS DATE)
+    return (datas - pd.to_timedelta(datas.dt.weekday, unit="D")).dt.normalize()
+
+def extrair(df_plannix, obras=None):
+    df = df_plannix if obras is None else df_plannix[df_plannix["nomeObra"].isin(obras)]
+    com_peca = df["nomePeca"].notna()
+    aux = pd.DataFrame({
+        "Obra": df["nomeObra"],
+        "Familia": df["familia"],
+        "Semana_Proj": _semana(df["data_Projeto"]),
+        "Semana_Fab": _semana(df["data_Acabamento"]),
+        "Semana_Mont": _semana(df["dataMontada"]),
+        "Semanal_Proj": df["volumeProjetado"].clip(lower=0).fillna(0.0),
+        "Semanal_Fab": df["volumeFabricado"].clip(lower=0).fillna(0.0),
+        "Semanal_Mont": df["volumeMontado"].clip(lower=0).fillna(0.0),
+        "Projetado": df["volumeProjetado"],
+        "Fabricado": df["volumeFabricado"],
+        "Acabado": df["volumeAcabado"],
+        "Expedido": df["volumeExpedido"],
+        "Montado": df["volumeMontado"],
+        "Aco": df["peso_frouxo_por_volume"],
+        "Qtd_Familia": (com_peca & df["volumeReal"].notna()).astype(np.int64),
+        "Volume_Familia": df["volumeReal"].where(com_peca),
+        "data_Projeto": df["data_Projeto"],
+        "data_Acabamento": df["data_Acabamento"],
+        "dataMontada": df["dataMontada"],
+    })
+    grupos = aux.groupby(["Obra", "Familia", "Semana_Proj", "Semana_Fab", "Semana_Mont"], dropna=False, sort=False)
+    df_ext = grupos.agg(
+        Semanal_Proj=("Semanal_Proj", "sum"), Semanal_Fab=("Semanal_Fab", "sum"), Semanal_Mont=("Semanal_Mont", "sum"),
+        Projetado=("Projetado", "sum"), Fabricado=("Fabricado", "sum"), Acabado=("Acabado", "sum"),
+        Expedido=("Expedido", "sum"), Montado=("Montado", "sum"),
+        Soma_Aco=("Aco", "sum"), Qtd_Aco=("Aco", "count"),
+        Qtd_Familia=("Qtd_Familia", "sum"), Volume_Familia=("Volume_Familia", "sum"),
+        ini_proj=("data_Projeto", "min"), fim_proj=("data_Projeto", "max"),
+        ini_fab=("data_Acabamento", "min"), fim_fab=("data_Acabamento", "max"),
+        ini_mont=("dataMontada", "min"), fim_mont=("dataMontada", "max"),
+    ).reset_index()
+    for col in carregamento.COLS_SEMANA + carregamento.COLS_DATAS:
+        df_ext[col] = pd.to_datetime(df_ext[col])
+    return df_ext
+
+def semanal_filtrado(df_plannix, obras, semana_inicio, semana_fim):
+    # Mesmos ramos da RAMO_SEMANAL_FILTRADO: anterior ao período numa semana só
+    df = df_plannix[df_plannix["nomeObra"].isin(obras)]
+    partes = []
+    for col_data, col_volume, destino in carregamento.RAMOS_SEMANAL:
+        linhas = df[(df[col_data] < semana_fim + pd.Timedelta(weeks=1)) & (df[col_volume] > 0)]
+        semana = _semana(linhas[col_data]).where(linhas[col_data] >= semana_inicio, semana_inicio - pd.Timedelta(weeks=1))
+        parte = pd.DataFrame({"Obra": linhas["nomeObra"], "Semana": semana, destino: linhas[col_volume]})
+        partes.append(parte.groupby(["Obra", "Semana"], as_index=False)[destino].sum())
+    return pd.concat(partes, ignore_index=True)[["Obra", "Semana"] + carregamento.COLS_VOLUME_SEMANAL].fillna(0.0)
+
+def indice_etapas(df_plannix):
+    # Mesmas colunas da QUERY_INDICE_ETAPAS: datas-limite e datas das peças com volume
+    colunas = {}
+    for (col_data, col_volume, _), etapa in zip(carregamento.RAMOS_SEMANAL, ("proj", "fab", "mont")):
+        datas = df_plannix.groupby("nomeObra")[col_data]
+        com_volume = df_plannix[col_data].where(df_plannix[col_volume] > 0).groupby(df_plannix["nomeObra"])
+        colunas.update({
+            f"ini_{etapa}": datas.min(), f"fim_{etapa}": datas.max(),
+            f"ini_vol_{etapa}": com_volume.min(), f"fim_vol_{etapa}": com_volume.max(),
+        })
+    df = pd.DataFrame(colunas).rename_axis("Obra").reset_index()
+    return df[["Obra"] + carregamento.COLS_DATAS + carregamento.COLS_DATAS_VOLUME]
+
+def orcamentos_sinteticos(df_plannix, folga=1.1):
+    # Orçamento = volume total da obra com uma folga; datas de cadastro em branco
+    total = df_plannix.groupby("nomeObra")["volumeReal"].sum() * folga
+    df = carregamento.unificar_obras(total.rename_axis("Obra").reset_index(name="Orcamento"))
+    return df.groupby("Obra", as_index=False)["Orcamento"].sum().assign(**{"Orcamento Lajes": 0.0})
+
+class BancoLocal:
+    def __init__(self, df_plannix, latencia_s=0.0):
+        self.df_plannix = df_plannix
+        self.latencia_s = latencia_s
+        self.watermark = 1
+        self.consultas = 0
+        self.extracoes_completas = 0  # ler_extracao sem obras: o plannix inteiro
+        self.tabelas = {
+            "orcamentos_usuario": orcamentos_sinteticos(df_plannix),
+            "previsoes_usuario": pd.DataFrame(columns=banco.COLUNAS_PREVISOES),
+        }
+
+    def _ida_e_volta(self):
+        self.consultas += 1
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+
+    @contextmanager
+    def conexao(self):
+        yield self
+
+    def ler_extracao(self, conn, obras=None):
+        self._ida_e_volta()
+        if obras is None:
+            self.extracoes_completas += 1
+        return extrair(self.df_plannix, obras)
+
+    def ler_indice_etapas(self, conn):
+        self._ida_e_volta()
+        return indice_etapas(self.df_plannix)
+
+    def ler_semanal_filtrado(self, conn, obras, semana_inicio, semana_fim):
+        self._ida_e_volta()
+        return semanal_filtrado(self.df_plannix, obras, semana_inicio, semana_fim)
+
+    def ler_watermark(self, conn):
+        self._ida_e_volta()
+        return self.watermark
+
+    def ler_obras_alteradas(self, conn, watermark):
+        self._ida_e_volta()
+        return []
+
+    def ler_sql(self, query, params=None):
+        self._ida_e_volta()
+        for tabela, df in self.tabelas.items():
+            if tabela in query:
+                return df.copy()
+        raise RuntimeError(f"Consulta sem equivalente no banco local: {query}")
+
+    def instalar(self):
+        banco.conexao = self.conexao
+        banco.ler_sql = self.ler_sql
+        banco.garantir_tabelas_usuario = lambda: True
+        carregamento.ler_extracao = self.ler_extracao
+        carregamento.ler_semanal_filtrado = self.ler_semanal_filtrado
+        carregamento.ler_indice_etapas = self.ler_indice_etapas
+        carregamento.ler_watermark = self.ler_watermark
+        carregamento.ler_obras_alteradas = self.ler_obras_alteradas
+        carregamento.ler_rollup_semanal = lambda catalogo: None
+        # Snapshots e log de diagnóstico dos benchmarks não se misturam com os do painel
+        temporario = Path(tempfile.mkdtemp(prefix="benchmarks_"))
+        snapshots.DIR_SNAPSHOTS = temporario / "snapshots"
+        diagnostico.registro_diagnostico().caminho_log = temporario / "diagnostico.jsonl"
+        return self
@@ -0,0 +1,238 @@
+import argparse
+import json
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit import config, logger
+
+# Os módulos do painel leem st.secrets na importação: os benchmarks usam um arquivo
+# próprio, sem credenciais (o banco é o substituto local)
+config.set_option("secrets.files", [str(Path(__file__).with_name("secrets_benchmark.toml"))])
+# Avisos do Streamlit sem runtime (cache, contexto, deprecações) poluem a saída
+logger.set_log_level("error")
+
+import carregamento
+import snapshots
+import war_room
+from base_compartilhada import BaseCompartilhada, carregar_base_filtrada
+from benchmarks.banco_local import BancoLocal
+from benchmarks.plannix_sintetico import gerar_plannix
+from benchmarks.war_room_stub import ServidorWarRoom
+from kpis import montar_kpis
+from planejador import combinar_curvas, perfis_das_obras, projetar_cenarios
+from preparacao import COLS_PREVISAO, MotorPrevisoes, calcular_previsoes, montar_acumulado_semanal
+from risco_cronograma import perfis_historicos, simular_risco
+
+DIR_RESULTADOS = Path(__file__).with_name("resultados")
+LIMIAR_REGRESSAO = 0.2   # 20% mais lento (e pelo menos 1 ms) conta como regressão
+# Mesmos rótulos do ABAS do painel
+ABAS_APP = ["📁 Cadastro", "📊 Tabelas", "📈 Gráficos", "🌍 Tabela Geral", "📅 Planejador", "🏗️ War Room"]
+
+# ========================================================
+#     BENCHMARKS DE PONTA A PONTA (SEM O BANCO DE PRODUÇÃO)
+# ========================================================
+# Gera o plannix sintético na escala pedida, instala o banco local e o stub do War
+# Room e cronometra cada etapa do painel. O resultado vai para benchmarks/resultados
+# (um JSON por execução, com o commit e a escala) e pode ser comparado com outro.
+#
+# Uso:
+#   python -m benchmarks.executar                         -> escala atual (40 obras)
+#   python -m benchmarks.executar --obras 200             -> 5x as obras
+#   python -m benchmarks.executar --comparar benchmarks/resultados/<arquivo>.json
+#   python -m benchmarks.executar --app                   -> inclui reruns do app inteiro (AppTest)
+def cronometrar(funcao, repeticoes, preparar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {"p50_ms": float(np.median(tempos)), "min_ms": float(min(tempos)), "max_ms": float(max(tempos)), "repeticoes": repeticoes}
+
+def _limpar_loaders():
+    for limpar in carregamento.LIMPEZAS_APOS_REVALIDAR:
+        limpar()
+    carregamento.curvas_em_cache.clear()
+    carregamento.indice_em_cache.clear()
+
+def conferir_filtro_sem_extracao_completa(banco_local):
+    # Processo novo com duas obras no filtro: catálogo, base filtrada e totais não podem
+    # ler o plannix inteiro (ler_extracao sem obras). Roda antes de os casos aquecerem a extração.
+    antes = banco_local.extracoes_completas
+    catalogo = carregamento.carregar_catalogo_obras()
+    chave = carregamento.chave_filtro(catalogo.index[:2].tolist(), catalogo['Semana_Ini'].min() - pd.Timedelta(weeks=10), catalogo['Semana_Fim'].max())
+    carregar_base_filtrada(*chave)
+    carregamento.carregar_dados_gerais(chave[0])
+    if banco_local.extracoes_completas != antes:
+        raise RuntimeError("O caminho filtrado leu a extração completa do plannix")
+    print("filtro com 2 obras: nenhuma extração completa")
+
+def montar_casos(args, stub):
+    hoje = pd.Timestamp.today().normalize()
+    cache = carregamento.obter_cache_extracao()
+    df_ext = cache.obter()
+    df_base = carregamento.carregar_dados()
+    df_orcamentos, df_previsoes = carregamento.carregar_dados_usuario()
+    base = BaseCompartilhada(df_base, df_orcamentos, df_previsoes)
+
+    # Previsões digitadas em ~5% das semanas, para o preenchimento ter trabalho
+    rng = np.random.default_rng(0)
+    semanal = base.semanal.copy()
+    marcadas = rng.random((len(semanal), len(COLS_PREVISAO))) < 0.05
+    semanal[COLS_PREVISAO] = np.where(marcadas, rng.choice([10.0, 40.0, 80.0, 100.0], marcadas.shape), 0.0)
+    motor = MotorPrevisoes()
+    motor.calcular(semanal, 0)
+    obra_editada = semanal['Obra'].iloc[len(semanal) // 2]
+
+    df_datas = carregamento.carregar_datas_limite_obras()
+    perfis = perfis_das_obras(df_datas).dropna(how='all')
+    df_familias = carregamento.carregar_dados_familias()
+    # Nova obra com todas as famílias, no volume médio do histórico (como digitado no planejador)
+    familias_input = df_familias.groupby('Familia', observed=True).agg(Quantidade=('unidade', 'mean'), Volume=('Volume', 'mean')).reset_index()
+    curvas = combinar_curvas(carregamento.carregar_curvas_familias(), familias_input)
+
+    filtro_2_obras = carregamento.chave_filtro(base.obras[:2], df_base['Semana'].min() - pd.Timedelta(weeks=10), df_base['Semana'].max())
+
+    def apagar_snapshot():
+        (snapshots.DIR_SNAPSHOTS / "extracao.arrow").unlink(missing_ok=True)
+
+    def gravar_snapshot():
+        snapshots.salvar_frame("extracao", df_ext, {"watermark": snapshots.watermark_para_json(cache.watermark)})
+
+    def carregar(funcao):
+        return (lambda: funcao(), _limpar_loaders)
+
+    casos = {
+        # Processo novo sem snapshot (lê o banco) e com o snapshot em disco
+        "loaders/extracao_partida_fria": (lambda: carregamento.CacheExtracao().obter(), apagar_snapshot),
+        "loaders/extracao_partida_quente": (lambda: carregamento.CacheExtracao().obter(), gravar_snapshot),
+        "loaders/carregar_dados": carregar(carregamento.carregar_dados),
+        "loaders/carregar_dados_gerais": carregar(carregamento.carregar_dados_gerais),
+        "loaders/carregar_dados_familias": carregar(carregamento.carregar_dados_familias),
+        "loaders/carregar_indice_etapas": carregar(carregamento.carregar_indice_etapas),
+        "loaders/carregar_curvas_familias": carregar(carregamento.carregar_curvas_familias),
+        "loaders/carregar_dados_usuario": (carregamento.carregar_dados_usuario, None),
+        # Duas obras com o filtro empurrado para o banco, no período padrão do painel
+        "loaders/base_filtrada_2_obras": carregar(lambda: carregar_base_filtrada(*filtro_2_obras)),
+        "loaders/snapshot_gravar": (gravar_snapshot, None),
+        "loaders/snapshot_ler": (lambda: snapshots.ler_frame("extracao"), None),
+        "secao4/montar_acumulado_semanal": (lambda: montar_acumulado_semanal(df_base, base.obras), None),
+        "secao4/base_compartilhada": (lambda: BaseCompartilhada(df_base, df_orcamentos, df_previsoes), None),
+        "previsoes/calcular_completo": (lambda: calcular_previsoes(semanal), None),
+        "previsoes/motor_uma_obra": (lambda: motor.calcular(semanal, 0, {obra_editada}), None),
+        "kpis/montar_kpis": (lambda: montar_kpis(carregamento.carregar_dados_gerais(), base.orcamentos, hoje), None),
+        "planejador/comparar_referencias": (lambda: projetar_cenarios(perfis, hoje, 1000.0), None),
+        "planejador/comparar_com_curvas": (lambda: projetar_cenarios(perfis, hoje, 1000.0, curvas), None),
+        "planejador/risco_monte_carlo": (lambda: simular_risco(perfis_historicos(df_datas), hoje, 1000.0, args.cenarios), None),
+    }
+
+    # War Room contra o stub: primeira leitura (processo novo) e leituras concorrentes
+    def primeira_leitura():
+        cliente = war_room.ClienteWarRoom(f"{stub.url}/api/war-room", "bench", timeout=10, intervalo_s=3600)
+        cliente.iniciar().obter()
+    cliente = war_room.ClienteWarRoom(f"{stub.url}/api/war-room", "bench", timeout=10, intervalo_s=3600).iniciar()
+    cliente.obter()
+
+    def leituras_concorrentes(threads=20, leituras=50):
+        def ler():
+            for _ in range(leituras):
+                cliente.obter()
+        grupo = [threading.Thread(target=ler) for _ in range(threads)]
+        for t in grupo: t.start()
+        for t in grupo: t.join()
+    casos["war_room/primeira_leitura"] = (primeira_leitura, None)
+    casos["war_room/1000_leituras_20_threads"] = (leituras_concorrentes, None)
+    return casos
+
+def casos_app(repeticoes):
+    # Rerun completo do script por aba, com os caches quentes (o que o usuário sente a cada clique)
+    from streamlit.testing.v1 import AppTest
+    resultados = {}
+    at = AppTest.from_file(str(Path(__file__).resolve().parent.parent / "apresentacao copy.py"), default_timeout=120)
+    at.run()
+    for aba in ABAS_APP:
+        at.radio(key="aba_ativa").set_value(aba).run()
+        resultados[f"app/{aba}"] = cronometrar(lambda: at.run(), repeticoes)
+        if at.exception:
+            raise RuntimeError(f"Aba {aba}: {at.exception[0].message}")
+    return resultados
+
+def versao_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "sem-git"
+
+def comparar(atual, anterior, limiar=LIMIAR_REGRESSAO):
+    linhas = []
+    for caso, medida in atual["casos"].items():
+        antes = anterior["casos"].get(caso)
+        if antes is None:
+            continue
+        razao = medida["p50_ms"] / antes["p50_ms"] if antes["p50_ms"] else float("nan")
+        regressao = razao > 1 + limiar and medida["p50_ms"] - antes["p50_ms"] > 1.0
+        linhas.append({"Caso": caso, "Antes (ms)": antes["p50_ms"], "Agora (ms)": medida["p50_ms"],
+                       "Razão": razao, "": "▲ regressão" if regressao else ""})
+    return pd.DataFrame(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do painel com plannix sintético e banco local.")
+    parser.add_argument("--obras", type=int, default=40)
+    parser.add_argument("--pecas", type=int, default=1500, help="peças por obra")
+    parser.add_argument("--familias", type=int, default=10)
+    parser.add_argument("--espalhamento", type=int, default=900, help="dias entre a obra mais antiga e hoje")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--cenarios", type=int, default=100_000, help="cenários do Monte Carlo")
+    parser.add_argument("--latencia-banco", type=float, default=0.0, help="segundos por consulta no banco local")
+    parser.add_argument("--app", action="store_true", help="inclui reruns do app inteiro por aba")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--saida", default=str(DIR_RESULTADOS))
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df_plannix = gerar_plannix(args.obras, args.pecas, args.familias, args.espalhamento)
+    print(f"plannix sintético: {len(df_plannix)} peças, {args.obras} obras ({time.perf_counter() - inicio:.1f} s)")
+    banco_local = BancoLocal(df_plannix, args.latencia_banco).instalar()
+    conferir_filtro_sem_extracao_completa(banco_local)
+    stub = ServidorWarRoom().iniciar()
+    war_room.WAR_ROOM_URL = f"{stub.url}/api/war-room"
+    war_room.WAR_ROOM_WEEK_URL = f"{stub.url}/api/war-room-week"
+
+    resultados = {}
+    for caso, (funcao, preparar) in montar_casos(args, stub).items():
+        resultados[caso] = cronometrar(funcao, args.repeticoes, preparar)
+        print(f"{caso:45s} p50 {resultados[caso]['p50_ms']:9.1f} ms")
+    if args.app:
+        for caso, medida in casos_app(args.repeticoes).items():
+            resultados[caso] = medida
+            print(f"{caso:45s} p50 {medida['p50_ms']:9.1f} ms")
+    stub.parar()
+
+    execucao = {
+        "meta": {
+            "commit": versao_codigo(), "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "obras": args.obras, "pecas_por_obra": args.pecas, "familias": args.familias,
+            "linhas_plannix": len(df_plannix), "linhas_extracao": len(carregamento.obter_cache_extracao().obter()),
+            "pandas": pd.__version__, "numpy": np.__version__,
+        },
+        "casos": resultados,
+    }
+    saida = Path(args.saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    arquivo = saida / f"{time.strftime('%Y%m%d-%H%M%S')}_{execucao['meta']['commit']}_{args.obras}obras.json"
+    arquivo.write_text(json.dumps(execucao, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"resultados em {arquivo}")
+
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        if anterior["meta"].get("obras") != args.obras:
+            print(f"⚠️ escalas diferentes: {anterior['meta'].get('obras')} x {args.obras} obras")
+        print(comparar(execucao, anterior).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+FAMILIAS = [
+    "Pilar", "Viga", "Laje Alveolar", "Painel", "Escada", "Telha W", "Terça",
+    "Bloco", "Estaca", "Viga Calha", "Laje Pi", "Consolo", "Muro", "Tirante",
+]
+OBRAS_REAIS = ["MALL SILVIO SILVEIRA - LOJAS", "MALL SILVIO SILVEIRA - POA"]  # exercitam a unificação
+
+# ========================================================
+#     GERADOR DE LINHAS SINTÉTICAS DO PLANNIX
+# ========================================================
+# Uma linha por peça, com as mesmas colunas que a extração lê do plannix. Cada obra
+# tem um cronograma próprio (duração e defasagem de cada etapa, como nos perfis do
+# planejador); cada peça cai dentro da etapa numa posição com forma de curva S.
+# Datas depois de "hoje" ficam vazias: a peça ainda não foi projetada/fabricada/montada.
+#
+# Uso: python -m benchmarks.plannix_sintetico --obras 200 --pecas 1500 --saida plannix.arrow
+def gerar_plannix(obras=40, pecas_por_obra=1500, familias=10, espalhamento_dias=900, semente=42, hoje=None):
+    rng = np.random.default_rng(semente)
+    hoje = pd.Timestamp.today().normalize() if hoje is None else pd.Timestamp(hoje)
+    nomes_obras = OBRAS_REAIS[:min(obras, 2)] + [f"OBRA {i:03d}" for i in range(max(obras - 2, 0))]
+    nomes_familias = (FAMILIAS * (familias // len(FAMILIAS) + 1))[:familias]
+    nomes_familias = [f if i < len(FAMILIAS) else f"{f} {i}" for i, f in enumerate(nomes_familias)]
+
+    # Cronograma de cada obra (dias)
+    inicio = hoje - pd.to_timedelta(rng.integers(30, espalhamento_dias, obras), unit="D")
+    dur_proj = rng.gamma(4, 30, obras)
+    lag_fab = rng.gamma(3, 20, obras)
+    dur_fab = rng.gamma(5, 35, obras)
+    lag_mont = lag_fab + rng.gamma(3, 25, obras)
+    dur_mont = rng.gamma(5, 40, obras)
+
+    n = obras * pecas_por_obra
+    obra = np.repeat(np.arange(obras), pecas_por_obra)
+    # Posição da peça dentro de cada etapa: beta(2, 2) dá o formato de S no acumulado
+    pos = rng.beta(2, 2, (3, n))
+
+    def data_etapa(lag, duracao, posicao):
+        dias = lag[obra] + duracao[obra] * posicao + rng.random(n)  # fração do dia = hora do apontamento
+        data = pd.DatetimeIndex(inicio[obra]) + pd.to_timedelta(dias, unit="D")
+        return pd.Series(data).where(data <= hoje)
+
+    data_projeto = data_etapa(np.zeros(obras), dur_proj, pos[0])
+    data_acabamento = data_etapa(lag_fab, dur_fab, pos[1])
+    data_montada = data_etapa(lag_mont, dur_mont, pos[2])
+
+    # Famílias com pesos diferentes por obra; volume por peça depende da família
+    pesos = np.cumsum(rng.dirichlet(np.ones(familias), obras), axis=1)
+    familia = np.minimum((rng.random(n)[:, None] > pesos[obra]).sum(axis=1), familias - 1)
+    volume_familia = rng.uniform(0.5, 6.0, familias)
+    volume_real = np.round(rng.lognormal(np.log(volume_familia[familia]), 0.35), 3)
+
+    def volume_se(data):
+        return np.where(data.notna(), volume_real, 0.0)
+
+    peso_aco = rng.normal(90, 20, n).clip(20)
+    peso_aco[rng.random(n) < 0.15] = np.nan
+    nome_peca = pd.Series([f"P{o}-{i}" for o, i in zip(obra, np.arange(n) % pecas_por_obra)])
+    nome_peca[rng.random(n) < 0.02] = None
+
+    return pd.DataFrame({
+        "nomeObra": np.array(nomes_obras, dtype=object)[obra],
+        "familia": np.array(nomes_familias, dtype=object)[familia],
+        "nomePeca": nome_peca,
+        "data_Projeto": data_projeto,
+        "data_Acabamento": data_acabamento,
+        "dataMontada": data_montada,
+        "volumeProjetado": volume_se(data_projeto),
+        "volumeFabricado": volume_se(data_acabamento),
+        "volumeAcabado": volume_se(data_acabamento),
+        "volumeExpedido": volume_se(data_montada),
+        "volumeMontado": volume_se(data_montada),
+        "peso_frouxo_por_volume": peso_aco,
+        "volumeReal": volume_real,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera linhas sintéticas do plannix.")
+    parser.add_argument("--obras", type=int, default=40)
+    parser.add_argument("--pecas", type=int, default=1500, help="peças por obra")
+    parser.add_argument("--familias", type=int, default=10)
+    parser.add_argument("--espalhamento", type=int, default=900, help="dias entre a obra mais antiga e hoje")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="plannix_sintetico.arrow", help="arquivo Arrow IPC (feather)")
+    args = parser.parse_args()
+
+    df = gerar_plannix(args.obras, args.pecas, args.familias, args.espalhamento, args.semente)
+    df.to_feather(args.saida)
+    print(f"{len(df)} peças ({args.obras} obras) gravadas em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+SETORES = [
+    ("Projeto", "vol_pc"), ("Armação", "kg"), ("Fôrma", "vol_pc"), ("Concretagem", "vol_pc"),
+    ("Acabamento", "vol_pc"), ("Pátio", "vol_pc"), ("Expedição", "carga"), ("Montagem", "vol_pc"),
+]
+
+# ========================================================
+#     PAYLOADS SINTÉTICOS (MESMOS CAMPOS DA API)
+# ========================================================
+def payload_war_room(semente=0):
+    rng = np.random.default_rng(semente)
+    linhas = []
+    for setor, unidade in SETORES:
+        prog = float(np.round(rng.uniform(20, 200), 1))
+        linhas.append({
+            "setor": setor, "unidade": unidade,
+            "progHoje": prog, "qProgHoje": int(rng.integers(5, 60)),
+            "realHoje8h": float(np.round(prog * rng.uniform(0, 0.3), 1)), "qReal8h": int(rng.integers(0, 20)),
+            "realHoje13h": float(np.round(prog * rng.uniform(0.3, 0.7), 1)), "qReal13h": int(rng.integers(5, 40)),
+            "realHoje18h": float(np.round(prog * rng.uniform(0.7, 1.1), 1)), "qReal18h": int(rng.integers(10, 60)),
+            "progOntem": prog, "qProgOntem": int(rng.integers(5, 60)),
+            "realOntem": float(np.round(prog * rng.uniform(0.7, 1.2), 1)), "qRealOntem": int(rng.integers(5, 60)),
+            "progAmanha": float(np.round(rng.uniform(20, 200), 1)), "qProgAmanha": int(rng.integers(5, 60)),
+        })
+    return linhas
+
+def payload_war_room_semanal(semanas=4, semente=0):
+    rng = np.random.default_rng(semente)
+    segunda = pd.Timestamp.today().normalize() - pd.Timedelta(days=pd.Timestamp.today().weekday())
+    linhas = []
+    for k in range(semanas):
+        inicio = segunda - pd.Timedelta(weeks=semanas - 1 - k)
+        for setor, _ in SETORES:
+            programado = float(np.round(rng.uniform(100, 900), 1))
+            linhas.append({
+                "inicio": inicio.date().isoformat(), "fim": (inicio + pd.Timedelta(days=4)).date().isoformat(),
+                "setor": setor, "total_programado": programado,
+                "total_realizado": float(np.round(programado * rng.uniform(0.6, 1.15), 1)),
+            })
+    return linhas
+
+# ========================================================
+#     SERVIDOR STUB DO WAR ROOM
+# ========================================================
+# Mesmas rotas da API, com ETag e 304 (o poller usa requisições condicionais).
+# latencia_s atrasa cada resposta; requisicoes conta as chamadas por rota.
+class ServidorWarRoom:
+    def __init__(self, porta=0, latencia_s=0.0, semente=0):
+        self.latencia_s = latencia_s
+        self.requisicoes = {"/api/war-room": 0, "/api/war-room-week": 0}
+        self.lock = threading.Lock()
+        self.corpos = {}
+        self.atualizar_payloads(semente)
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                corpo, etag = servidor.corpos.get(self.path, (None, None))
+                if corpo is None:
+                    self.send_error(404)
+                    return
+                with servidor.lock:
+                    servidor.requisicoes[self.path] += 1
+                if servidor.latencia_s:
+                    time.sleep(servidor.latencia_s)
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self.thread = None
+
+    def atualizar_payloads(self, semente):
+        for rota, dados in [("/api/war-room", payload_war_room(semente)), ("/api/war-room-week", payload_war_room_semanal(semente=semente))]:
+            corpo = json.dumps(dados, ensure_ascii=False).encode()
+            self.corpos[rota] = (corpo, f'"{hashlib.md5(corpo).hexdigest()}"')
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.http.server_port}"
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.http.serve_forever, daemon=True, name="war-room-stub")
+        self.thread.start()
+        return self
+
+    def parar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+# Uso: python -m benchmarks.war_room_stub --porta 8765
+# e nos secrets do painel: war_room_url = "http://127.0.0.1:8765/api/war-room"
+#                          war_room_week_url = "http://127.0.0.1:8765/api/war-room-week"
+def main():
+    parser = argparse.ArgumentParser(description="Servidor stub da API do War Room.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de atraso por resposta")
+    parser.add_argument("--mudar-a-cada", type=float, default=30.0, help="segundos entre payloads novos (0 = fixo)")
+    args = parser.parse_args()
+
+    servidor = ServidorWarRoom(args.porta, args.latencia).iniciar()
+    print(f"War Room stub em {servidor.url}/api/war-room e {servidor.url}/api/war-room-week")
+    semente = 0
+    try:
+        while True:
+            time.sleep(args.mudar_a_cada or 3600)
+            if args.mudar_a_cada:
+                semente += 1
+                servidor.atualizar_payloads(semente)
+    except KeyboardInterrupt:
+        servidor.parar()
+
+if __name__ == "__main__":
+    main()
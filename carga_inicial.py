@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Tempo máximo (s) que a página espera pelas fontes opcionais antes de seguir sem elas
+ORCAMENTO_CARGA_S = 3.0
+
+# ========================================================
+#     CARGA INICIAL CONCORRENTE
+# ========================================================
+# As fontes (MySQL e APIs) são independentes: disparadas juntas, a carga leva o
+# tempo da mais lenta em vez da soma. Fontes opcionais que estourarem o orçamento
+# continuam rodando em segundo plano e aquecem o cache para a próxima execução.
+class CargaInicial:
+    def __init__(self):
+        self.valores = {}
+        self.erros = {}
+        self.latencias = {}
+        self.futuros = {}
+
+    def pendente(self, nome):
+        # Consultado na hora, não no fim da carga: uma opcional que estourou o orçamento
+        # termina em segundo plano (fragmentos reaproveitam este objeto nas reexecuções)
+        futuro = self.futuros.get(nome)
+        return futuro is not None and not futuro.done()
+
+    def obter(self, nome):
+        # None = ainda carregando (estourou o orçamento)
+        if nome in self.erros:
+            raise self.erros[nome]
+        return self.valores.get(nome)
+
+def _medir(carga, nome, funcao):
+    inicio = time.perf_counter()
+    try:
+        carga.valores[nome] = funcao()
+    except Exception as e:
+        carga.erros[nome] = e
+    finally:
+        carga.latencias[nome] = time.perf_counter() - inicio
+
+def carregar_em_paralelo(fontes, opcionais=(), orcamento_s=ORCAMENTO_CARGA_S):
+    carga = CargaInicial()
+    ctx = get_script_run_ctx()
+    # Sem o contexto da execução, st.cache_data nas threads reclama a cada chamada
+    executor = ThreadPoolExecutor(
+        max_workers=len(fontes), thread_name_prefix="carga",
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+    carga.futuros = {nome: executor.submit(_medir, carga, nome, funcao) for nome, funcao in fontes.items()}
+    executor.shutdown(wait=False)
+
+    wait(carga.futuros.values(), timeout=orcamento_s)
+    for nome, futuro in carga.futuros.items():
+        if not futuro.done() and nome not in opcionais:
+            # Obrigatórias (sem elas a página não monta) são esperadas até o fim
+            futuro.result()
+    return carga
@@ -0,0 +1,599 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import banco
+import snapshots
+from diagnostico import loader_medido
+from preparacao import tipar_semanal
+
+TTL_DADOS = 300
+
+# Coluna de controle do plannix (timestamp de atualização ou id monotônico).
+# Sem ela configurada nos secrets, toda expiração do cache refaz a leitura completa.
+COLUNA_WATERMARK = st.secrets.get("plannix_coluna_watermark")
+# A cada N atualizações incrementais refazemos a leitura completa (pega exclusões de peças)
+CICLOS_ATE_RECARGA_COMPLETA = 12
+
+OBRAS_UNIFICADAS = {'MALL SILVIO SILVEIRA - LOJAS': 'MALL SILVIO SILVEIRA - POA'}
+
+# ========================================================
+#     EXTRAÇÃO ÚNICA DO PLANNIX
+# ========================================================
+# Uma só varredura agrupada por obra, família e semana de cada etapa. Cada grupo traz
+# as somas e datas-limite necessárias para derivar o semanal, os totais por obra,
+# as famílias e as médias do cronograma sem voltar ao banco.
+QUERY_EXTRACAO = """
+    SELECT
+        nomeObra AS Obra,
+        familia AS Familia,
+        CAST(DATE_SUB(data_Projeto, INTERVAL WEEKDAY(data_Projeto) DAY) AS DATE) AS Semana_Proj,
+        CAST(DATE_SUB(data_Acabamento, INTERVAL WEEKDAY(data_Acabamento) DAY) AS DATE) AS Semana_Fab,
+        CAST(DATE_SUB(dataMontada, INTERVAL WEEKDAY(dataMontada) DAY) AS DATE) AS Semana_Mont,
+        SUM(CASE WHEN volumeProjetado > 0 THEN volumeProjetado ELSE 0 END) AS Semanal_Proj,
+        SUM(CASE WHEN volumeFabricado > 0 THEN volumeFabricado ELSE 0 END) AS Semanal_Fab,
+        SUM(CASE WHEN volumeMontado > 0 THEN volumeMontado ELSE 0 END) AS Semanal_Mont,
+        SUM(volumeProjetado) AS Projetado,
+        SUM(volumeFabricado) AS Fabricado,
+        SUM(volumeAcabado) AS Acabado,
+        SUM(volumeExpedido) AS Expedido,
+        SUM(volumeMontado) AS Montado,
+        SUM(peso_frouxo_por_volume) AS Soma_Aco,
+        COUNT(peso_frouxo_por_volume) AS Qtd_Aco,
+        SUM(CASE WHEN nomePeca IS NOT NULL AND volumeReal IS NOT NULL THEN 1 ELSE 0 END) AS Qtd_Familia,
+        SUM(CASE WHEN nomePeca IS NOT NULL THEN volumeReal END) AS Volume_Familia,
+        MIN(data_Projeto) AS ini_proj, MAX(data_Projeto) AS fim_proj,
+        MIN(data_Acabamento) AS ini_fab, MAX(data_Acabamento) AS fim_fab,
+        MIN(dataMontada) AS ini_mont, MAX(dataMontada) AS fim_mont
+    FROM `plannix-db`.`plannix`
+    {filtro}
+    GROUP BY nomeObra, familia, Semana_Proj, Semana_Fab, Semana_Mont;
+"""
+
+COLS_SEMANA = ['Semana_Proj', 'Semana_Fab', 'Semana_Mont']
+COLS_DATAS = ['ini_proj', 'fim_proj', 'ini_fab', 'fim_fab', 'ini_mont', 'fim_mont']
+
+def ler_extracao(conn, obras=None):
+    if obras is None:
+        df = pd.read_sql(QUERY_EXTRACAO.format(filtro=""), conn)
+    else:
+        marcadores = ", ".join(["%s"] * len(obras))
+        df = pd.read_sql(QUERY_EXTRACAO.format(filtro=f"WHERE nomeObra IN ({marcadores})"), conn, params=tuple(obras))
+    for col in COLS_SEMANA + COLS_DATAS:
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+def ler_watermark(conn):
+    if not COLUNA_WATERMARK:
+        return None
+    df = pd.read_sql(f"SELECT MAX(`{COLUNA_WATERMARK}`) AS wm FROM `plannix-db`.`plannix`", conn)
+    wm = df['wm'].iloc[0]
+    if pd.isna(wm): return None
+    # Timestamp/np.int64 -> tipos nativos, que o conector aceita como parâmetro
+    if isinstance(wm, pd.Timestamp): return wm.to_pydatetime()
+    return wm.item() if hasattr(wm, 'item') else wm
+
+def ler_obras_alteradas(conn, watermark):
+    df_obras = pd.read_sql(
+        f"SELECT DISTINCT nomeObra FROM `plannix-db`.`plannix` WHERE `{COLUNA_WATERMARK}` > %s",
+        conn, params=(watermark,)
+    )
+    return df_obras['nomeObra'].dropna().tolist()
+
+def aplicar_delta(df, df_delta, obras_alteradas):
+    return pd.concat([df[~df['Obra'].isin(obras_alteradas)], df_delta], ignore_index=True)
+
+# ========================================================
+#     FILTROS EMPURRADOS PARA O BANCO (OBRAS E PERÍODO)
+# ========================================================
+# Quem olha poucas obras não precisa da extração completa: o semanal e os totais vêm de
+# consultas restritas às obras e ao período escolhidos, servidas pelos índices
+# (nomeObra, data da etapa) de migracoes/001_indices_plannix.sql. Cada filtro fica no
+# cache pela sua chave (obras em ordem, semanas alinhadas na segunda-feira); acima de
+# MAX_FILTROS_EM_CACHE chaves as mais antigas saem.
+MAX_OBRAS_FILTRO_BANCO = int(st.secrets.get("max_obras_filtro_banco", 5))
+MAX_FILTROS_EM_CACHE = 32
+
+# Um ramo por etapa: cada um lê só a faixa (obra, data < fim do período) do seu índice.
+# O que é anterior ao período vira uma linha só, na semana antes do início, para o
+# acumulado continuar partindo do histórico inteiro da obra.
+RAMOS_SEMANAL = [
+    ('data_Projeto', 'volumeProjetado', 'Volume_Projetado'),
+    ('data_Acabamento', 'volumeFabricado', 'Volume_Fabricado'),
+    ('dataMontada', 'volumeMontado', 'Volume_Montado'),
+]
+COLS_VOLUME_SEMANAL = [destino for _, _, destino in RAMOS_SEMANAL]
+
+RAMO_SEMANAL_FILTRADO = """
+    SELECT
+        nomeObra AS Obra,
+        CASE WHEN {data} < %s THEN %s
+             ELSE CAST(DATE_SUB({data}, INTERVAL WEEKDAY({data}) DAY) AS DATE) END AS Semana,
+        {volumes}
+    FROM `plannix-db`.`plannix`
+    WHERE nomeObra IN ({obras}) AND {data} < %s AND {volume} > 0
+    GROUP BY Obra, Semana
+"""
+
+def usar_filtro_no_banco(obras):
+    return bool(obras) and len(obras) <= MAX_OBRAS_FILTRO_BANCO
+
+def semanas_do_filtro(data_inicio, data_fim):
+    # Segunda-feira da primeira semana que entra no período e da última
+    inicio = pd.Timestamp(data_inicio).normalize()
+    inicio += pd.Timedelta(days=(7 - inicio.weekday()) % 7)
+    fim = pd.Timestamp(data_fim).normalize()
+    fim -= pd.Timedelta(days=fim.weekday())
+    return inicio, fim
+
+def chave_filtro(obras, data_inicio, data_fim):
+    return (tuple(sorted(obras)),) + semanas_do_filtro(data_inicio, data_fim)
+
+def obras_brutas(obras):
+    # Nomes como estão no plannix: uma obra unificada também traz as de origem
+    return sorted(set(obras) | {bruto for bruto, destino in OBRAS_UNIFICADAS.items() if destino in obras})
+
+def ler_semanal_filtrado(conn, obras, semana_inicio, semana_fim):
+    marcadores = ", ".join(["%s"] * len(obras))
+    ramos, params = [], []
+    for col_data, col_volume, destino in RAMOS_SEMANAL:
+        volumes = ", ".join(f"SUM({col_volume}) AS {c}" if c == destino else f"0 AS {c}" for c in COLS_VOLUME_SEMANAL)
+        ramos.append(RAMO_SEMANAL_FILTRADO.format(data=col_data, volume=col_volume, volumes=volumes, obras=marcadores))
+        params += [semana_inicio.date(), (semana_inicio - pd.Timedelta(weeks=1)).date(), *obras, (semana_fim + pd.Timedelta(weeks=1)).date()]
+    df = pd.read_sql(" UNION ALL ".join(ramos), conn, params=tuple(params))
+    df['Semana'] = pd.to_datetime(df['Semana'])
+    return df
+
+# Uma linha por obra com o início e o fim de cada etapa: as datas-limite (todas as peças,
+# para o cronograma e o cadastro) e as da primeira e última peça com volume (as semanas
+# do catálogo, com o mesmo critério do semanal). Pequena o bastante para o catálogo dos
+# filtros nunca depender da extração completa.
+QUERY_INDICE_ETAPAS = """
+    SELECT
+        nomeObra AS Obra,
+        MIN(data_Projeto) AS ini_proj, MAX(data_Projeto) AS fim_proj,
+        MIN(data_Acabamento) AS ini_fab, MAX(data_Acabamento) AS fim_fab,
+        MIN(dataMontada) AS ini_mont, MAX(dataMontada) AS fim_mont,
+        MIN(CASE WHEN volumeProjetado > 0 THEN data_Projeto END) AS ini_vol_proj,
+        MAX(CASE WHEN volumeProjetado > 0 THEN data_Projeto END) AS fim_vol_proj,
+        MIN(CASE WHEN volumeFabricado > 0 THEN data_Acabamento END) AS ini_vol_fab,
+        MAX(CASE WHEN volumeFabricado > 0 THEN data_Acabamento END) AS fim_vol_fab,
+        MIN(CASE WHEN volumeMontado > 0 THEN dataMontada END) AS ini_vol_mont,
+        MAX(CASE WHEN volumeMontado > 0 THEN dataMontada END) AS fim_vol_mont
+    FROM `plannix-db`.`plannix`
+    GROUP BY nomeObra
+"""
+COLS_DATAS_VOLUME = ['ini_vol_proj', 'fim_vol_proj', 'ini_vol_fab', 'fim_vol_fab', 'ini_vol_mont', 'fim_vol_mont']
+
+def ler_indice_etapas(conn):
+    df = pd.read_sql(QUERY_INDICE_ETAPAS, conn)
+    for col in COLS_DATAS + COLS_DATAS_VOLUME:
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+# Chamadas depois que a revalidação em segundo plano troca os dados do snapshot
+# (limpam os caches derivados para a próxima execução já ver a extração nova)
+LIMPEZAS_APOS_REVALIDAR = []
+
+# --- ESTADO DO CACHE INCREMENTAL (um por processo) ---
+# Guarda a extração com os nomes de obra *brutos*, para que o delta de uma obra
+# substitua apenas as linhas dela; a unificação acontece na derivação.
+class CacheExtracao:
+    def __init__(self):
+        self.df = None
+        self.watermark = None
+        self.ciclos = 0
+        self.versao = 0
+        self.atualizado_em = 0.0
+        self.origem = None  # "banco" ou "snapshot"
+        self.lock = threading.Lock()
+
+    def _recarga_completa(self, conn):
+        # O watermark é lido antes dos dados: o que mudar durante a leitura volta no próximo delta
+        self.watermark = ler_watermark(conn)
+        self.df = ler_extracao(conn)
+        self.ciclos = 0
+        self.versao += 1
+
+    def _recarga_incremental(self, conn):
+        novo_watermark = ler_watermark(conn)
+        if novo_watermark is None or novo_watermark == self.watermark:
+            self.ciclos += 1
+            return
+        obras_alteradas = ler_obras_alteradas(conn, self.watermark)
+        if obras_alteradas:
+            self.df = aplicar_delta(self.df, ler_extracao(conn, obras_alteradas), obras_alteradas)
+            self.versao += 1
+        self.watermark = novo_watermark
+        self.ciclos += 1
+
+    # --- SNAPSHOT EM DISCO (RESTART QUENTE) ---
+    def _salvar_snapshot(self):
+        snapshots.gravar_em_segundo_plano(
+            snapshots.salvar_frame, "extracao", self.df, {"watermark": snapshots.watermark_para_json(self.watermark)}
+        )
+
+    def _carregar_snapshot(self):
+        lido = snapshots.ler_frame("extracao")
+        if lido is None:
+            return False
+        self.df, meta = lido
+        self.watermark = snapshots.watermark_de_json(meta.get("watermark"))
+        self.ciclos = 0
+        self.versao += 1
+        self.origem = "snapshot"
+        return True
+
+    def _revalidar_snapshot(self):
+        # Sonda barata (MAX do watermark): igual ao do snapshot, nada a fazer; diferente,
+        # só as obras alteradas desde o snapshot são lidas. Sem watermark, leitura completa.
+        # A consulta roda fora do lock: as sessões continuam lendo o snapshot enquanto isso.
+        versao, df, watermark = self.versao, self.df, self.watermark
+        try:
+            with banco.conexao() as conn:
+                novo_watermark = ler_watermark(conn)
+                if novo_watermark is not None and novo_watermark == watermark:
+                    df_novo = df
+                elif novo_watermark is not None and watermark is not None:
+                    obras_alteradas = ler_obras_alteradas(conn, watermark)
+                    df_novo = aplicar_delta(df, ler_extracao(conn, obras_alteradas), obras_alteradas) if obras_alteradas else df
+                else:
+                    df_novo = ler_extracao(conn)
+        except Exception:
+            return  # banco fora: segue com o snapshot até a próxima expiração do TTL
+        with self.lock:
+            if self.versao != versao:
+                return
+            self.origem = "banco"
+            self.watermark = novo_watermark
+            self.atualizado_em = time.monotonic()
+            if df_novo is df:
+                return
+            self.df = df_novo
+            self.versao += 1
+        self._salvar_snapshot()
+        for limpar in LIMPEZAS_APOS_REVALIDAR:
+            limpar()
+
+    def disponivel(self):
+        # Já lida neste processo ou com snapshot em disco: obter() não faz a leitura completa
+        return self.df is not None or snapshots.existe_frame("extracao")
+
+    def obter(self, ttl=TTL_DADOS):
+        # Todos os loaders compartilham a mesma extração; ela só é refeita após o TTL
+        with self.lock:
+            if self.df is None and self._carregar_snapshot():
+                # Processo novo: a página sai do snapshot e o banco é conferido em segundo plano
+                self.atualizado_em = time.monotonic()
+                threading.Thread(target=self._revalidar_snapshot, daemon=True, name="revalida-snapshot").start()
+            if self.df is None or time.monotonic() - self.atualizado_em >= ttl:
+                versao = self.versao
+                with banco.conexao() as conn:
+                    if (self.df is None or not COLUNA_WATERMARK or self.watermark is None
+                            or self.ciclos >= CICLOS_ATE_RECARGA_COMPLETA):
+                        self._recarga_completa(conn)
+                    else:
+                        self._recarga_incremental(conn)
+                self.atualizado_em = time.monotonic()
+                self.origem = "banco"
+                if self.versao != versao:
+                    self._salvar_snapshot()
+            return self.df
+
+@st.cache_resource
+def obter_cache_extracao():
+    return CacheExtracao()
+
+def unificar_obras(df):
+    df = df.copy()
+    df['Obra'] = df['Obra'].replace(OBRAS_UNIFICADAS)
+    return df
+
+# ========================================================
+#     DERIVAÇÕES (SEM ACESSO AO BANCO)
+# ========================================================
+def derivar_semanal(df_ext):
+    partes = []
+    for col_semana, col_vol, destino in [
+        ('Semana_Proj', 'Semanal_Proj', 'Volume_Projetado'),
+        ('Semana_Fab', 'Semanal_Fab', 'Volume_Fabricado'),
+        ('Semana_Mont', 'Semanal_Mont', 'Volume_Montado'),
+    ]:
+        # Mesmo critério dos ramos do antigo UNION ALL: data presente e volume > 0
+        parte = df_ext.loc[df_ext[col_semana].notna() & (df_ext[col_vol] > 0), ['Obra', col_semana, col_vol]]
+        partes.append(parte.rename(columns={col_semana: 'Semana', col_vol: destino}))
+    df = unificar_obras(pd.concat(partes, ignore_index=True))
+    cols_vol = ['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']
+    df[cols_vol] = df[cols_vol].fillna(0.0)
+    return df.groupby(['Obra', 'Semana'], as_index=False)[cols_vol].sum()
+
+def derivar_gerais(df_ext):
+    cols_soma = ['Projetado', 'Fabricado', 'Acabado', 'Expedido', 'Montado', 'Soma_Aco', 'Qtd_Aco']
+    df_geral = df_ext.groupby('Obra', as_index=False)[cols_soma].sum()
+    # Média por obra bruta primeiro e depois entre obras unificadas, como no AVG + mean anterior
+    df_geral['Taxa de Aço'] = df_geral['Soma_Aco'] / df_geral['Qtd_Aco'].replace(0, np.nan)
+    df_geral = unificar_obras(df_geral.drop(columns=['Soma_Aco', 'Qtd_Aco']))
+    return df_geral.groupby('Obra', as_index=False).agg({
+        'Projetado': 'sum', 'Fabricado': 'sum', 'Acabado': 'sum',
+        'Expedido': 'sum', 'Montado': 'sum', 'Taxa de Aço': 'mean'
+    })
+
+def derivar_familias(df_ext):
+    df = df_ext[df_ext['Familia'].notna() & (df_ext['Qtd_Familia'] > 0)]
+    df = unificar_obras(df[['Obra', 'Familia', 'Qtd_Familia', 'Volume_Familia']])
+    df = df.rename(columns={'Qtd_Familia': 'unidade', 'Volume_Familia': 'Volume'})
+    df = df.groupby(['Obra', 'Familia'], as_index=False).sum().sort_values(['Obra', 'Familia'], ignore_index=True)
+    return df.astype({'Obra': 'category', 'Familia': 'category', 'Volume': 'float32'})
+
+def semana_de(datas):
+    return (datas - pd.to_timedelta(datas.dt.weekday, unit='D')).dt.normalize()
+
+def derivar_catalogo(df_indice):
+    # Primeira e última semana com volume de cada obra (já unificada), entre as três etapas:
+    # as mesmas obras e semanas da base completa (derivar_semanal)
+    df = pd.DataFrame({
+        'Obra': df_indice.index.to_series().replace(OBRAS_UNIFICADAS).to_numpy(),
+        'Semana_Ini': semana_de(df_indice[['ini_vol_proj', 'ini_vol_fab', 'ini_vol_mont']].min(axis=1)).to_numpy(),
+        'Semana_Fim': semana_de(df_indice[['fim_vol_proj', 'fim_vol_fab', 'fim_vol_mont']].max(axis=1)).to_numpy(),
+    }).dropna()
+    return df.groupby('Obra').agg(Semana_Ini=('Semana_Ini', 'min'), Semana_Fim=('Semana_Fim', 'max'))
+
+def marcar_bordas(df_semanal, catalogo, obras, semana_inicio, semana_fim):
+    # Semanas sem volume nas bordas de cada obra, para o preenchimento de lacunas gerar no
+    # período as mesmas linhas que geraria com o histórico completo (inclusive as semanas
+    # de margem depois da última, onde o usuário digita as previsões)
+    bordas = catalogo[catalogo.index.isin(obras)]
+    anterior = semana_inicio - pd.Timedelta(weeks=1)
+    primeira = np.minimum(bordas['Semana_Ini'].clip(lower=anterior), bordas['Semana_Fim'])
+    ultima = np.maximum(primeira, bordas['Semana_Fim'].clip(upper=semana_fim))
+    # Obra que terminou antes do período: o histórico agrupado volta para a sua última semana
+    agrupado = df_semanal['Semana'] == anterior
+    df_semanal.loc[agrupado, 'Semana'] = df_semanal.loc[agrupado, 'Obra'].map(primeira).fillna(anterior)
+    marcas = pd.DataFrame({
+        'Obra': np.concatenate([bordas.index, bordas.index]),
+        'Semana': np.concatenate([primeira.to_numpy(), ultima.to_numpy()]),
+    })
+    marcas[COLS_VOLUME_SEMANAL] = 0.0
+    return pd.concat([df_semanal, marcas], ignore_index=True)
+
+def derivar_datas_unificadas(df_datas):
+    # Mesmas datas por obra unificada (a lista de obras e o cadastro usam o nome unificado)
+    df = df_datas.rename(index=OBRAS_UNIFICADAS)
+    return df.groupby(level='Obra').agg({col: ('min' if col.startswith('ini') else 'max') for col in COLS_DATAS})
+
+def derivar_medias_cronograma(df_datas):
+    datas = df_datas.dropna(subset=['ini_proj', 'ini_fab', 'ini_mont'])
+    # DATEDIFF ignora a hora: normaliza antes de subtrair
+    datas = datas.apply(lambda s: s.dt.normalize())
+    def dias(fim, ini):
+        return (datas[fim] - datas[ini]).dt.days.mean()
+    return pd.DataFrame([{
+        'dias_duracao_proj': dias('fim_proj', 'ini_proj'),
+        'dias_lag_fab': dias('ini_fab', 'ini_proj'),
+        'dias_duracao_fab': dias('fim_fab', 'ini_fab'),
+        'dias_lag_mont': dias('ini_mont', 'ini_proj'),
+        'dias_duracao_mont': dias('fim_mont', 'ini_mont'),
+    }])
+
+# --- CURVAS S POR FAMÍLIA E ETAPA ---
+# Para cada obra, o período de uma etapa (da primeira à última semana com volume da
+# família) é normalizado para [0, 1] e o volume acumulado para [0, 1]. A curva da
+# família é a média entre as obras, avaliada numa grade fixa de PONTOS_CURVA pontos.
+PONTOS_CURVA = 41
+ETAPAS_CURVA = {'proj': ('Semana_Proj', 'Semanal_Proj'), 'fab': ('Semana_Fab', 'Semanal_Fab'), 'mont': ('Semana_Mont', 'Semanal_Mont')}
+
+def derivar_curvas_familias(df_ext):
+    grade = np.linspace(0.0, 1.0, PONTOS_CURVA)
+    partes = []
+    for etapa, (col_semana, col_vol) in ETAPAS_CURVA.items():
+        df = df_ext.loc[df_ext['Familia'].notna() & df_ext[col_semana].notna() & (df_ext[col_vol] > 0)]
+        df = unificar_obras(df[['Obra', 'Familia', col_semana, col_vol]])
+        df = df.groupby(['Familia', 'Obra', col_semana], as_index=False)[col_vol].sum()
+        if df.empty:
+            continue
+        grupo = df.groupby(['Familia', 'Obra'])
+        primeira = grupo[col_semana].transform('min')
+        qtd = ((grupo[col_semana].transform('max') - primeira).dt.days // 7 + 1).to_numpy()
+        idx = ((df[col_semana] - primeira).dt.days // 7).to_numpy()
+        peso = (df[col_vol] / grupo[col_vol].transform('sum')).to_numpy()
+        # Volume de cada semana espalhado por igual no seu trecho [idx/qtd, (idx+1)/qtd] da grade
+        acumulado = np.clip(grade[None, :] * qtd[:, None] - idx[:, None], 0.0, 1.0) * peso[:, None]
+        por_obra = pd.DataFrame(acumulado).groupby([df['Familia'], df['Obra']]).sum()
+        curva = por_obra.groupby(level='Familia').mean()
+        curva.index = pd.MultiIndex.from_product([curva.index, [etapa]], names=['Familia', 'Etapa'])
+        partes.append(curva)
+    if not partes:
+        return pd.DataFrame(columns=range(PONTOS_CURVA))
+    return pd.concat(partes).sort_index()
+
+# ========================================================
+# FUNÇÃO PARA LER DADOS (POR SEMANA)
+# ========================================================
+# O rollup (plannix_semanal, mantido pelo job rollup_semanal.py) cobre só o semanal da
+# base completa. Catálogo e índice de etapas têm consulta própria, e totais e famílias
+# continuam na extração; por isso ele só é lido quando a extração ainda não está no
+# processo (nem em snapshot): com ela à mão o semanal sai dela, sem ida ao banco.
+# Acima desta idade o rollup é considerado parado (o job deixou de rodar)
+IDADE_MAXIMA_ROLLUP_S = 3 * TTL_DADOS
+
+def ler_rollup_semanal(catalogo):
+    # None (o semanal vem da extração) se o job ainda não rodou, a tabela não existe, a
+    # última atualização é velha demais ou as obras não batem com as do catálogo (job
+    # atrasado: o filtro mostraria obras sem linhas)
+    try:
+        with banco.conexao() as conn:
+            controle = pd.read_sql("SELECT atualizado_em FROM `plannix_semanal_controle` WHERE id = 1", conn)
+            if controle.empty:
+                return None
+            # O job grava atualizado_em com o relógio local (datetime.now()), como aqui
+            idade = pd.Timestamp.now() - pd.Timestamp(controle['atualizado_em'].iloc[0])
+            if idade.total_seconds() > IDADE_MAXIMA_ROLLUP_S:
+                return None
+            df = pd.read_sql(
+                "SELECT Obra, Semana, Volume_Projetado, Volume_Fabricado, Volume_Montado "
+                "FROM `plannix_semanal` ORDER BY Obra, Semana", conn
+            )
+    except Exception:
+        return None
+    if set(df['Obra']) != set(catalogo.index):
+        return None
+    df['Semana'] = pd.to_datetime(df['Semana'])
+    return df
+
+@loader_medido(st.cache_data(ttl=TTL_DADOS, max_entries=MAX_FILTROS_EM_CACHE))
+def carregar_dados(obras=None, semana_inicio=None, semana_fim=None):
+    if obras is not None:
+        # Só as obras e o período do filtro (chave_filtro), direto do plannix
+        with banco.conexao() as conn:
+            df = ler_semanal_filtrado(conn, obras_brutas(obras), semana_inicio, semana_fim)
+        df = unificar_obras(df).groupby(['Obra', 'Semana'], as_index=False)[COLS_VOLUME_SEMANAL].sum()
+        return tipar_semanal(marcar_bordas(df, carregar_catalogo_obras(), obras, semana_inicio, semana_fim))
+    cache = obter_cache_extracao()
+    df = None if cache.disponivel() else ler_rollup_semanal(carregar_catalogo_obras())
+    if df is None:
+        df = derivar_semanal(cache.obter())
+    return tipar_semanal(df)
+
+# ========================================================
+#     DADOS SALVOS DO USUÁRIO (CADASTRO E PREVISÕES)
+# ========================================================
+def carregar_dados_usuario():
+    try:
+        banco.garantir_tabelas_usuario()
+    except:
+        pass
+    df_orcamentos_salvos = pd.DataFrame(columns=["Obra", "Orcamento", "Orcamento Lajes"])
+    df_previsoes_salvas = pd.DataFrame(columns=["Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"])
+
+    try:
+        df_orcamentos_salvos = banco.ler_sql("SELECT * FROM orcamentos_usuario")
+    except:
+        pass
+    
+    try:
+        df_previsoes_salvas = banco.ler_sql("SELECT * FROM previsoes_usuario")
+        if not df_previsoes_salvas.empty:
+            df_previsoes_salvas['Semana'] = pd.to_datetime(df_previsoes_salvas['Semana'])
+    except:
+        pass
+
+    return df_orcamentos_salvos, df_previsoes_salvas
+
+# ========================================================
+# FUNÇÃO PARA LER DADOS (TOTAIS POR OBRA)
+# ========================================================
+@loader_medido(st.cache_data(ttl=TTL_DADOS, max_entries=MAX_FILTROS_EM_CACHE))
+def carregar_extracao_filtrada(obras):
+    with banco.conexao() as conn:
+        return ler_extracao(conn, obras_brutas(obras))
+
+def extracao(obras=None):
+    # Sem filtro: a extração completa compartilhada; com filtro: só as linhas das obras
+    return obter_cache_extracao().obter() if obras is None else carregar_extracao_filtrada(obras)
+
+@loader_medido(st.cache_data(ttl=TTL_DADOS, max_entries=MAX_FILTROS_EM_CACHE))
+def carregar_dados_gerais(obras=None):
+    return derivar_gerais(extracao(obras))
+
+# ========================================================
+# FUNÇÃO PARA LER DADOS (POR FAMÍLIA)
+# ========================================================
+@loader_medido(st.cache_data(ttl=TTL_DADOS, max_entries=MAX_FILTROS_EM_CACHE))
+def carregar_dados_familias(obras=None):
+    return derivar_familias(extracao(obras))
+
+# ========================================================
+# ÍNDICE DE ETAPAS (INÍCIO E FIM DE CADA ETAPA POR OBRA)
+# ========================================================
+# Vem de uma consulta própria (QUERY_INDICE_ETAPAS), nunca da extração completa: com
+# poucas obras no filtro o painel abre sem ler o plannix inteiro. Como a extração, tem
+# snapshot em disco: um processo novo parte dele e confere o banco em segundo plano.
+# O catálogo dos filtros, o planejador, as médias do cronograma e as datas padrão do
+# cadastro leem daqui: trocar a referência no planejador não vai ao banco.
+# Os frames são compartilhados entre as sessões: quem precisar alterar faz uma cópia.
+class IndiceEtapas:
+    def __init__(self, df_indice):
+        df = df_indice.dropna(subset=['Obra']).set_index('Obra')
+        self.datas = df[COLS_DATAS]                             # por obra bruta (cronograma médio e perfis)
+        self.unificadas = derivar_datas_unificadas(self.datas)  # por obra unificada (cadastro)
+        self.catalogo = derivar_catalogo(df)                    # só obras com volume, como a base
+        self.medias = derivar_medias_cronograma(self.datas)
+
+class CacheIndiceEtapas:
+    def __init__(self):
+        self.df = None
+        self.versao = 0
+        self.atualizado_em = 0.0
+        self.lock = threading.Lock()
+
+    def _trocar(self, df):
+        self.df = df
+        self.versao += 1
+        self.atualizado_em = time.monotonic()
+        snapshots.gravar_em_segundo_plano(snapshots.salvar_frame, "indice_etapas", df)
+
+    def _revalidar_snapshot(self):
+        try:
+            with banco.conexao() as conn:
+                df = ler_indice_etapas(conn)
+        except Exception:
+            return  # banco fora: segue com o snapshot até a próxima expiração do TTL
+        with self.lock:
+            self._trocar(df)
+
+    def obter(self, ttl=TTL_DADOS):
+        with self.lock:
+            if self.df is None:
+                lido = snapshots.ler_frame("indice_etapas")
+                if lido is not None:
+                    self.df = lido[0]
+                    self.versao += 1
+                    self.atualizado_em = time.monotonic()
+                    threading.Thread(target=self._revalidar_snapshot, daemon=True, name="revalida-indice").start()
+            if self.df is None or time.monotonic() - self.atualizado_em >= ttl:
+                with banco.conexao() as conn:
+                    self._trocar(ler_indice_etapas(conn))
+            return self.df
+
+@st.cache_resource
+def obter_cache_indice_etapas():
+    return CacheIndiceEtapas()
+
+@loader_medido(st.cache_resource(max_entries=2))
+def indice_em_cache(versao, _df_indice):
+    # Chave = versão do índice, como as curvas por família
+    return IndiceEtapas(_df_indice)
+
+def carregar_indice_etapas():
+    cache = obter_cache_indice_etapas()
+    df_indice = cache.obter()
+    return indice_em_cache(cache.versao, df_indice)
+
+def carregar_catalogo_obras():
+    # Lista de obras e período de cada uma sem carregar o semanal de todas
+    return carregar_indice_etapas().catalogo
+
+def carregar_datas_limite_obras():
+    # Datas-limite de todas as obras de uma vez (o planejador compara referências em lote)
+    return carregar_indice_etapas().datas
+
+@loader_medido(st.cache_data(max_entries=4))
+def curvas_em_cache(versao, _df_ext):
+    # Chave = versão da extração: as curvas só são refeitas quando os dados mudam
+    return derivar_curvas_familias(_df_ext)
+
+def carregar_curvas_familias():
+    cache = obter_cache_extracao()
+    df_ext = cache.obter()
+    return curvas_em_cache(cache.versao, df_ext)
+
+def calcular_medias_cronograma():
+    return carregar_indice_etapas().medias
+
+LIMPEZAS_APOS_REVALIDAR.extend([
+    carregar_dados.clear, carregar_dados_gerais.clear, carregar_dados_familias.clear,
+    carregar_extracao_filtrada.clear,
+])
@@ -0,0 +1,176 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from memoria import medir_bytes
+
+MAX_EVENTOS = 20_000   # buffer circular em memória (por processo)
+MAX_LOG_MB = 50        # acima disso o JSON-lines gira para .1
+INTERVALO_GRAVACAO_S = 2.0  # os eventos vão para o arquivo em lotes, fora do caminho da página
+MAX_TAMANHOS = 256     # tamanhos de resultado guardados por loader (reaproveitados nos hits)
+CAMINHO_LOG = Path(st.secrets.get("log_diagnostico", "logs/diagnostico.jsonl"))
+# Sem a senha nos secrets a aba não aparece; com ela, abre com ?diagnostico=<senha> na URL
+SENHA_DIAGNOSTICO = st.secrets.get("senha_diagnostico")
+
+_local = threading.local()
+
+# ========================================================
+#     REGISTRO DE EVENTOS (UM POR PROCESSO)
+# ========================================================
+# Cada medição vira um evento: tipo (loader, carga, etapa, aba, widget, rerun),
+# nome, duração e, quando há um frame, linhas e bytes. Os eventos ficam num buffer
+# circular para a aba Diagnóstico; uma thread anexa os pendentes ao arquivo JSON-lines
+# a cada INTERVALO_GRAVACAO_S (e na saída do processo), sem segurar o lock do registro.
+class RegistroDiagnostico:
+    def __init__(self, caminho_log=CAMINHO_LOG, max_eventos=MAX_EVENTOS):
+        self.eventos = deque(maxlen=max_eventos)
+        self.pendentes = []
+        self.lock = threading.Lock()
+        self.lock_arquivo = threading.Lock()
+        self.caminho_log = caminho_log
+        threading.Thread(target=self._gravar_periodicamente, daemon=True, name="diagnostico-log").start()
+        atexit.register(self.descarregar)
+
+    def _gravar(self, linhas):
+        try:
+            self.caminho_log.parent.mkdir(parents=True, exist_ok=True)
+            if self.caminho_log.exists() and self.caminho_log.stat().st_size > MAX_LOG_MB * 2**20:
+                os.replace(self.caminho_log, self.caminho_log.with_name(self.caminho_log.name + ".1"))
+            with open(self.caminho_log, "a", encoding="utf-8") as arquivo:
+                arquivo.writelines(linha + "\n" for linha in linhas)
+        except OSError:
+            pass  # sem disco o buffer em memória continua valendo
+
+    def descarregar(self):
+        with self.lock:
+            eventos, self.pendentes = self.pendentes, []
+        if eventos:
+            with self.lock_arquivo:
+                self._gravar([json.dumps(evento, ensure_ascii=False, default=str) for evento in eventos])
+
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(INTERVALO_GRAVACAO_S)
+            self.descarregar()
+
+    def registrar(self, tipo, nome, ms=None, obj=None, **extras):
+        evento = {"ts": time.time(), "tipo": tipo, "nome": nome, "ms": ms}
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            evento["linhas"] = len(obj)
+            evento["bytes"] = medir_bytes(obj)
+        evento.update(extras)
+        with self.lock:
+            self.eventos.append(evento)
+            self.pendentes.append(evento)
+
+    def frame(self):
+        with self.lock:
+            return pd.DataFrame(list(self.eventos))
+
+@st.cache_resource
+def registro_diagnostico():
+    return RegistroDiagnostico()
+
+def registrar_evento(tipo, nome, ms=None, obj=None, **extras):
+    registro_diagnostico().registrar(tipo, nome, ms, obj, **extras)
+
+@contextmanager
+def medir(tipo, nome, **extras):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_evento(tipo, nome, (time.perf_counter() - inicio) * 1000, **extras)
+
+# ========================================================
+#     LOADERS COM CACHE: TEMPO, TAMANHO E HIT/MISS
+# ========================================================
+# O corpo da função só roda quando o cache erra; ele marca a chamada em andamento
+# (uma pilha por thread, porque um loader pode chamar outro) e o invólucro de fora
+# registra hit ou miss. Linhas e bytes do resultado só são medidos no miss e reaproveitados
+# nos hits com os mesmos argumentos. Uso: @loader_medido(st.cache_data(ttl=...)) no lugar
+# do decorador.
+def _chave_tamanho(args, kwargs):
+    try:
+        chave = (args, tuple(sorted(kwargs.items())))
+        hash(chave)
+        return chave
+    except TypeError:
+        return None  # argumento sem hash (frame com _ na frente): um tamanho por loader
+
+def _tamanho_resultado(resultado):
+    if isinstance(resultado, (pd.DataFrame, pd.Series)):
+        return {"linhas": len(resultado), "bytes": medir_bytes(resultado)}
+    return {}
+
+def loader_medido(decorador_cache):
+    def decorar(funcao):
+        tamanhos = {}
+        @functools.wraps(funcao)
+        def corpo(*args, **kwargs):
+            pilha = getattr(_local, "pilha", None)
+            if pilha:
+                pilha[-1] = True
+            return funcao(*args, **kwargs)
+        cacheada = decorador_cache(corpo)
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            pilha = _local.__dict__.setdefault("pilha", [])
+            pilha.append(False)
+            inicio = time.perf_counter()
+            try:
+                resultado = cacheada(*args, **kwargs)
+            finally:
+                executou = pilha.pop()
+            ms = (time.perf_counter() - inicio) * 1000
+            chave = _chave_tamanho(args, kwargs)
+            if executou or chave not in tamanhos:
+                if len(tamanhos) >= MAX_TAMANHOS:
+                    tamanhos.clear()
+                tamanhos[chave] = _tamanho_resultado(resultado)
+            registrar_evento("loader", funcao.__name__, ms, cache="miss" if executou else "hit", **tamanhos[chave])
+            return resultado
+        medida.clear = cacheada.clear
+        return medida
+    return decorar
+
+# ========================================================
+#     RESUMO PARA A ABA DIAGNÓSTICO
+# ========================================================
+def diagnostico_liberado():
+    return bool(SENHA_DIAGNOSTICO) and st.query_params.get("diagnostico") == SENHA_DIAGNOSTICO
+
+def resumo_tempos(df_eventos):
+    if df_eventos.empty:
+        return pd.DataFrame()
+    df = df_eventos
+    for col in ["linhas", "bytes", "cache"]:
+        if col not in df.columns:
+            df = df.assign(**{col: pd.NA})
+    grupos = df.groupby(["tipo", "nome"])
+    resumo = pd.DataFrame({
+        "Chamadas": grupos.size(),
+        "p50 (ms)": grupos["ms"].quantile(0.5),
+        "p95 (ms)": grupos["ms"].quantile(0.95),
+        "Máx (ms)": grupos["ms"].max(),
+        "Hit (%)": grupos["cache"].agg(lambda s: (s == "hit").mean() * 100 if s.notna().any() else None),
+        "Linhas": grupos["linhas"].last(),
+        "MB": grupos["bytes"].last() / 2**20,
+    })
+    return resumo.reset_index().rename(columns={"tipo": "Tipo", "nome": "Nome"}).sort_values("p95 (ms)", ascending=False, ignore_index=True)
+
+def registrar_etapas_sessao():
+    # Tamanho de cada etapa do pipeline nesta execução (as medições do memoria.py)
+    linhas = st.session_state.get('linhas_etapas', {})
+    for etapa, qtd_bytes in st.session_state.get('memoria_etapas', {}).items():
+        registrar_evento("etapa_tamanho", etapa, linhas=linhas.get(etapa), bytes=qtd_bytes)
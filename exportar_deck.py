@@ -0,0 +1,161 @@
+import argparse
+import datetime
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from streamlit import logger
+
+from base_compartilhada import carregar_base_compartilhada, recortar_semanal
+from carregamento import carregar_dados_gerais
+from graficos import montar_formato_longo, spec_base, spec_estatico
+from kpis import kpis_obras, CONFIG_COLUNAS_KPI
+from preparacao import calcular_previsoes
+
+try:
+    import vl_convert
+except ImportError:
+    vl_convert = None  # sem o vl-convert os gráficos são desenhados pelo vega-embed ao abrir o arquivo
+
+VEGA_EMBED = """<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>"""
+
+ESTILO = """<style>
+body { font-family: sans-serif; margin: 24px; color: #222; }
+h1 { margin-bottom: 4px; }
+h2 { color: #1f77b4; text-align: center; }
+section { page-break-after: always; }
+.grafico { width: 100%; }
+.grafico svg { width: 100%; height: auto; }
+table { border-collapse: collapse; font-size: 12px; width: 100%; }
+th, td { border: 1px solid #ddd; padding: 4px 6px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+th { background: #f0f2f6; }
+</style>"""
+
+# ========================================================
+#     TABELAS (MESMOS RÓTULOS E FORMATOS DO PAINEL)
+# ========================================================
+def tabela_html(df, config_colunas=CONFIG_COLUNAS_KPI):
+    df_fmt = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        config = config_colunas.get(col, {})
+        formato = config.get("type_config", {}).get("format")
+        rotulo = config.get("label") or col
+        if formato:
+            df_fmt[rotulo] = [("" if pd.isna(v) else formato % v) for v in df[col]]
+        else:
+            df_fmt[rotulo] = df[col].astype(object).where(df[col].notna(), "")
+    return df_fmt.to_html(index=False, border=0)
+
+# ========================================================
+#     RENDERIZAÇÃO DE UM SLIDE (RODA NOS PROCESSOS DO POOL)
+# ========================================================
+# Cada processo recebe o spec base uma vez; por obra chegam só o frame longo da obra
+# e a linha do resumo. Com o vl-convert o gráfico vira SVG (arquivo estático, pronto
+# para imprimir em PDF); sem ele, o spec vai embutido para o vega-embed.
+_spec_base_processo = None
+
+def _iniciar_processo(base):
+    global _spec_base_processo
+    _spec_base_processo = base
+
+def grafico_html(spec, indice):
+    if vl_convert is not None:
+        return f'<div class="grafico">{vl_convert.vegalite_to_svg(spec)}</div>'
+    spec["width"] = "container"
+    return (f'<div class="grafico" id="grafico-{indice}"></div>\n'
+            f'<script>vegaEmbed("#grafico-{indice}", {json_para_script(spec)}, {{"actions": false}});</script>')
+
+def json_para_script(spec):
+    # "</" dentro de um <script> fecharia a tag antes da hora
+    return json.dumps(spec, ensure_ascii=False).replace("</", "<\\/")
+
+def renderizar_slide(tarefa):
+    indice, total, obra, df_obra, df_resumo = tarefa
+    partes = [f'<section>\n<h2>{html.escape(str(obra))}</h2>',
+              f'<p style="text-align: center;">Obra <b>{indice + 1}</b> de <b>{total}</b></p>']
+    if not df_obra.empty:
+        partes.append(grafico_html(spec_estatico(_spec_base_processo, df_obra), indice))
+    partes.append('<h3>📋 Resumo Consolidado da Obra</h3>')
+    partes.append(tabela_html(df_resumo) if not df_resumo.empty else '<p>Sem resumo para esta obra.</p>')
+    partes.append('</section>\n')
+    return "\n".join(partes)
+
+# ========================================================
+#     EXPORTAÇÃO DO DECK (MESMO PIPELINE DO PAINEL)
+# ========================================================
+# Base compartilhada, recorte semanal com o cadastro salvo, previsões e KPIs: os
+# mesmos passos das abas Gráficos e Tabela Geral, sem sessão e sem edições.
+# Os slides saem do pool na ordem das obras e são gravados assim que ficam prontos;
+# o arquivo final só substitui o anterior quando o deck está completo.
+def exportar_deck(saida, obras=None, data_inicio=None, data_fim=None, processos=None):
+    inicio = time.perf_counter()
+    base = carregar_base_compartilhada()
+    df_base = base.df_base
+    escolhidas = None if obras is None else set(obras)
+    obras = [o for o in base.obras if escolhidas is None or o in escolhidas]
+    data_inicio = pd.to_datetime(data_inicio) if data_inicio else df_base['Semana'].min() - pd.Timedelta(weeks=10)
+    data_fim = pd.to_datetime(data_fim) if data_fim else df_base['Semana'].max()
+
+    df_calculado = calcular_previsoes(recortar_semanal(base.semanal, base.orcamentos, obras, data_inicio, data_fim))
+    df_longo = montar_formato_longo(df_calculado)
+    posicoes = df_longo.groupby("Obra", observed=True).indices
+    vazio = df_longo.iloc[:0]
+
+    hoje = pd.to_datetime(datetime.date.today())
+    df_kpis = kpis_obras(carregar_dados_gerais(), base.orcamentos, hoje)
+    if escolhidas is not None:
+        # Com --obras o resumo geral do fim do deck mostra só as obras dos slides
+        df_kpis = df_kpis[df_kpis["Obra"].isin(obras)]
+
+    tarefas = (
+        (i, len(obras), obra, df_longo.iloc[posicoes[obra]] if obra in posicoes else vazio, df_kpis[df_kpis["Obra"] == obra])
+        for i, obra in enumerate(obras)
+    )
+
+    saida = Path(saida)
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    parcial = saida.with_name(saida.name + ".parcial")
+    periodo = f"{data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y}"
+    with open(parcial, "w", encoding="utf-8") as arquivo:
+        arquivo.write('<!DOCTYPE html>\n<html lang="pt-BR">\n<head>\n<meta charset="utf-8">\n<title>Reunião de Prazos</title>\n')
+        arquivo.write(ESTILO + "\n")
+        if vl_convert is None:
+            arquivo.write(VEGA_EMBED + "\n")
+        arquivo.write(f'</head>\n<body>\n<h1>📊 Reunião de Prazos</h1>\n<p>Gerado em {datetime.datetime.now():%d/%m/%Y %H:%M} · período {periodo} · {len(obras)} obras</p>\n')
+
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo, initargs=(spec_base(),)) as executor:
+            for i, slide in enumerate(executor.map(renderizar_slide, tarefas), start=1):
+                arquivo.write(slide)
+                arquivo.flush()
+                print(f"  {i}/{len(obras)} {obras[i - 1]}", flush=True)
+
+        arquivo.write('<section>\n<h2>🏗️ Resumo Geral Detalhado</h2>\n')
+        arquivo.write(tabela_html(df_kpis))
+        arquivo.write('\n</section>\n</body>\n</html>\n')
+    os.replace(parcial, saida)
+    return saida, time.perf_counter() - inicio
+
+# Uso: python exportar_deck.py --saida deck.html [--obras "OBRA A" "OBRA B"] [--inicio 2024-01-01] [--fim 2024-12-31]
+# Roda da pasta do painel (lê o mesmo .streamlit/secrets.toml).
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o deck da reunião (todas as obras) para um HTML estático.")
+    parser.add_argument("--saida", default="deck_reuniao.html")
+    parser.add_argument("--obras", nargs="*", help="obras a exportar (padrão: todas)")
+    parser.add_argument("--inicio", help="data de início (padrão: 10 semanas antes da primeira)")
+    parser.add_argument("--fim", help="data final (padrão: última semana com dados)")
+    parser.add_argument("--processos", type=int, help="processos de renderização (padrão: um por CPU)")
+    args = parser.parse_args()
+
+    logger.set_log_level("error")  # sem o servidor do Streamlit os caches avisam a cada chamada
+    saida, segundos = exportar_deck(args.saida, args.obras, args.inicio, args.fim, args.processos)
+    print(f"Deck gravado em {saida} ({segundos:.1f} s){'' if vl_convert else ' — gráficos via vega-embed (instale vl-convert-python para SVG estático)'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+from streamlit import dataframe_util
+
+METRICAS_GRAFICO = ["Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"]
+STATUS_METRICA = {m: "Previsão" if "Previst" in m else "Realizado" for m in METRICAS_GRAFICO}
+
+MAX_VERSOES = 4   # frames longos guardados (a versão muda a cada edição de previsão)
+MAX_SPECS = 256   # specs prontos (obra x versão)
+
+# ========================================================
+#     FORMATO LONGO PARA OS GRÁFICOS (UMA VEZ POR VERSÃO)
+# ========================================================
+def montar_formato_longo(df_calculado):
+    metricas = [c for c in METRICAS_GRAFICO if c in df_calculado.columns]
+    df_melt = df_calculado.melt(
+        id_vars=["Obra", "Semana_Display", "Semana"],
+        value_vars=metricas,
+        var_name="Metrica",
+        value_name="Porcentagem"
+    )
+    df_melt["Obra"] = df_melt["Obra"].astype("category")
+    df_melt["Metrica"] = pd.Categorical(df_melt["Metrica"], categories=metricas)
+    # Coluna extra para forçar a linha tracejada: mapeada por categoria, não linha a linha
+    df_melt["Status"] = df_melt["Metrica"].map(STATUS_METRICA).astype("category")
+    return df_melt
+
+# ========================================================
+#     SPEC VEGA-LITE DO SLIDE
+# ========================================================
+# A codificação é a mesma para todas as obras: o Altair monta e valida o spec uma
+# vez, com os dados apontando para um dataset nomeado, e cada obra só acrescenta
+# os seus dados já serializados em Arrow.
+def spec_base():
+    chart = alt.Chart(alt.Data(name="dados")).mark_line(point=True, strokeWidth=3).encode(
+        x=alt.X('Semana_Display:N', sort=alt.SortField(field="Semana", order='ascending'), title='Semana'),
+        y=alt.Y('Porcentagem:Q', title='Avanço (%)'),
+        color=alt.Color('Metrica:N', scale=alt.Scale(scheme='category10'), title='Métrica'),
+        # Lemos a coluna Status diretamente. [1, 0] = Linha Sólida | [5, 5] = Linha Tracejada
+        strokeDash=alt.StrokeDash(
+            'Status:N',
+            scale=alt.Scale(domain=["Realizado", "Previsão"], range=[[1, 0], [5, 5]]),
+            title='Tipo de Linha'
+        ),
+        tooltip=[
+            alt.Tooltip('Obra:N'),
+            alt.Tooltip('Semana_Display:N'),
+            alt.Tooltip('Metrica:N', title='Métrica'),
+            alt.Tooltip('Porcentagem:Q', format='.1f')
+        ]
+    ).properties(height=350).interactive()
+    # Mesmo ajuste do st.altair_chart: sem o tema padrão (largura fixa) do Altair
+    with alt.theme.enable("none"):
+        return chart.to_dict()
+
+class LojaGraficos:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.base = None
+        self.longos = OrderedDict()  # versão -> (frame longo, posições por obra)
+        self.specs = OrderedDict()   # (versão, obra) -> spec
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graficos")
+
+    def _longo(self, versao, df_calculado):
+        with self.lock:
+            if versao in self.longos:
+                self.longos.move_to_end(versao)
+                return self.longos[versao]
+        df_longo = montar_formato_longo(df_calculado)
+        posicoes = df_longo.groupby("Obra", observed=True).indices
+        with self.lock:
+            self.longos[versao] = (df_longo, posicoes)
+            while len(self.longos) > MAX_VERSOES:
+                self.longos.popitem(last=False)
+        return df_longo, posicoes
+
+    def _montar_spec(self, versao, df_calculado, obra):
+        with self.lock:
+            if self.base is None:
+                self.base = spec_base()
+            base = self.base
+        df_longo, posicoes = self._longo(versao, df_calculado)
+        if obra not in posicoes:
+            return None
+        df_obra = df_longo.iloc[posicoes[obra]]
+        spec = dict(base)
+        spec["datasets"] = {"dados": dataframe_util.convert_anything_to_arrow_bytes(df_obra)}
+        return spec
+
+    def spec(self, versao, df_calculado, obra):
+        chave = (versao, obra)
+        with self.lock:
+            if chave in self.specs:
+                self.specs.move_to_end(chave)
+                return self.specs[chave]
+        spec = self._montar_spec(versao, df_calculado, obra)
+        with self.lock:
+            self.specs[chave] = spec
+            while len(self.specs) > MAX_SPECS:
+                self.specs.popitem(last=False)
+        return spec
+
+    def pre_carregar(self, versao, df_calculado, obras):
+        # Anterior e próxima obra ficam prontas enquanto a atual está na tela
+        with self.lock:
+            faltando = [o for o in obras if (versao, o) not in self.specs]
+        for obra in faltando:
+            self.executor.submit(self.spec, versao, df_calculado, obra)
+
+@st.cache_resource
+def loja_graficos():
+    return LojaGraficos()
+
+# ========================================================
+#     SPEC COM OS DADOS EMBUTIDOS (EXPORTAÇÃO ESTÁTICA)
+# ========================================================
+# Fora do Streamlit os dados vão como JSON: o vega-embed e o vl-convert não leem
+# o dataset em Arrow que o st.vega_lite_chart recebe.
+def spec_estatico(base, df_obra):
+    spec = dict(base)
+    spec["datasets"] = {"dados": json.loads(df_obra.to_json(orient="records", date_format="iso"))}
+    return spec
+
+def spec_para_exibir(spec):
+    # O st.vega_lite_chart altera o dict recebido (tira os datasets): entrega uma cópia
+    return None if spec is None else copy.deepcopy(spec)
@@ -0,0 +1,69 @@
+import pandas as pd
+import streamlit as st
+
+from diagnostico import loader_medido
+
+ETAPAS_KPI = ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
+COLS_NUM_KPI = ["Orcamento", "Orcamento Lajes"] + ETAPAS_KPI
+SALDOS_KPI = {"Saldo Proj": "Fim Projeto", "Saldo Fab": "Fim Fabricacao", "Saldo Mont": "Fim Montagem"}
+
+COLUNAS_KPI = [
+    "Obra", "Orcamento", "Orcamento Lajes",
+    "Projetado", "Projetado %", "Saldo Proj",
+    "Taxa de Aço",
+    "Fabricado", "Fabricado %", "Saldo Fab",
+    "Acabado", "Acabado %",
+    "Expedido", "Expedido %",
+    "Montado", "Montado %", "Saldo Mont"
+]
+
+CONFIG_COLUNAS_KPI = {
+    "Orcamento": st.column_config.NumberColumn("Orçamento", format="%.2f"),
+    "Orcamento Lajes": st.column_config.NumberColumn("Orç. Lajes", format="%.2f"),
+    "Taxa de Aço": st.column_config.NumberColumn("Aço (kg/m³)", format="%.2f"),
+    "Projetado": st.column_config.NumberColumn("Vol. Proj.", format="%.2f"),
+    "Projetado %": st.column_config.NumberColumn("Proj. %", format="%.1f%%"),
+    "Saldo Proj": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
+    "Fabricado": st.column_config.NumberColumn("Vol. Fab.", format="%.2f"),
+    "Fabricado %": st.column_config.NumberColumn("Fab. %", format="%.1f%%"),
+    "Saldo Fab": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
+    "Montado": st.column_config.NumberColumn("Vol. Mont.", format="%.2f"),
+    "Montado %": st.column_config.NumberColumn("Mont. %", format="%.1f%%"),
+    "Saldo Mont": st.column_config.NumberColumn("⏳ Dias", format="%d d"),
+    "Acabado": st.column_config.NumberColumn("Vol. Acab.", format="%.2f"),
+    "Acabado %": st.column_config.NumberColumn("Acab. %", format="%.1f%%"),
+    "Expedido": st.column_config.NumberColumn("Vol. Exp.", format="%.2f"),
+    "Expedido %": st.column_config.NumberColumn("Exp. %", format="%.1f%%"),
+}
+
+# ========================================================
+#     KPIs POR OBRA (TABELA GERAL + RESUMO DO SLIDE)
+# ========================================================
+def versao_frame(df):
+    # Impressão digital barata do conteúdo; serve de chave de cache para frames pequenos
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+def montar_kpis(df_geral, df_orcamentos, hoje):
+    df = df_geral.merge(df_orcamentos.drop_duplicates(subset=['Obra'], keep='first'), on="Obra", how="left")
+
+    for col in COLS_NUM_KPI:
+        if col in df.columns: df[col] = df[col].fillna(0.0)
+
+    orcamento = df["Orcamento"] if "Orcamento" in df.columns else pd.Series(0.0, index=df.index)
+    divisor = orcamento.where(orcamento > 0)
+    for etapa in ETAPAS_KPI:
+        df[f"{etapa} %"] = (df[etapa] / divisor * 100).fillna(0.0)
+
+    for saldo, col_fim in SALDOS_KPI.items():
+        fim = pd.to_datetime(df[col_fim], errors='coerce') if col_fim in df.columns else pd.Series(pd.NaT, index=df.index)
+        df[saldo] = (fim - hoje).dt.days
+
+    return df[[c for c in COLUNAS_KPI if c in df.columns]]
+
+@loader_medido(st.cache_data(max_entries=64))
+def kpis_em_cache(versao_dados, versao_orcamentos, hoje, _df_geral, _df_orcamentos):
+    # Os frames não entram no hash: a chave é (versão dos dados, versão do orçamento, dia)
+    return montar_kpis(_df_geral, _df_orcamentos, hoje)
+
+def kpis_obras(df_geral, df_orcamentos, hoje):
+    return kpis_em_cache(versao_frame(df_geral), versao_frame(df_orcamentos), hoje, df_geral, df_orcamentos)
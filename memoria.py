@@ -0,0 +1,33 @@
+import pandas as pd
+import streamlit as st
+
+# Teto de memória (MB) dos frames de uma sessão; acima disso a página pede um filtro menor
+LIMITE_MEMORIA_SESSAO_MB = float(st.secrets.get("limite_memoria_sessao_mb", 256))
+
+# ========================================================
+#     CONTABILIDADE DE MEMÓRIA POR SESSÃO
+# ========================================================
+# Cada etapa do pipeline registra o tamanho (deep) do frame que produziu. O total
+# da sessão é a soma da última medição de cada etapa.
+def medir_bytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    return 0
+
+def registrar_memoria(etapa, df):
+    st.session_state.setdefault('memoria_etapas', {})[etapa] = medir_bytes(df)
+    st.session_state.setdefault('linhas_etapas', {})[etapa] = len(df)
+    return df
+
+def bytes_sessao():
+    return sum(st.session_state.get('memoria_etapas', {}).values())
+
+def tabela_memoria():
+    etapas = st.session_state.get('memoria_etapas', {})
+    df = pd.DataFrame({'Etapa': list(etapas), 'MB': [b / 2**20 for b in etapas.values()]})
+    return df.sort_values('MB', ascending=False, ignore_index=True)
+
+def limite_excedido():
+    return bytes_sessao() > LIMITE_MEMORIA_SESSAO_MB * 2**20
@@ -0,0 +1,26 @@
+-- ========================================================
+--     ÍNDICES COMPOSTOS DO PLANNIX (FILTROS NO BANCO)
+-- ========================================================
+-- As consultas filtradas do painel (carregamento.ler_semanal_filtrado e ler_extracao
+-- com obras) filtram por nomeObra e por um intervalo na data de cada etapa. Com (nomeObra, data da etapa) cada ramo lê só a faixa da obra
+-- no índice, em vez de varrer a tabela inteira.
+--
+-- Aplicar uma vez, fora do horário da reunião:
+--   mysql -h <host> -u <usuario> -p plannix-db < migracoes/001_indices_plannix.sql
+-- ALGORITHM=INPLACE, LOCK=NONE: a tabela continua aceitando leitura e escrita durante a criação.
+
+ALTER TABLE `plannix-db`.`plannix`
+    ADD INDEX `idx_plannix_obra_projeto` (`nomeObra`, `data_Projeto`),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `plannix-db`.`plannix`
+    ADD INDEX `idx_plannix_obra_acabamento` (`nomeObra`, `data_Acabamento`),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `plannix-db`.`plannix`
+    ADD INDEX `idx_plannix_obra_montada` (`nomeObra`, `dataMontada`),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Conferência: os três ramos do semanal filtrado devem usar os índices acima (type = range)
+-- EXPLAIN SELECT nomeObra, data_Projeto FROM `plannix-db`.`plannix`
+--     WHERE nomeObra IN ('OBRA A') AND data_Projeto < '2025-01-06' AND volumeProjetado > 0;
@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+MEDIA_GERAL = "Média Geral (Todas as Obras)"
+
+# Durações e defasagens (dias) que descrevem o cronograma de uma referência;
+# mesmos nomes da tabela de médias (calcular_medias_cronograma)
+COLS_PERFIL = ['dias_duracao_proj', 'dias_lag_fab', 'dias_duracao_fab', 'dias_lag_mont', 'dias_duracao_mont']
+ETAPAS_PLANO = {"proj": "Projeto (Vol)", "fab": "Fabricação (Vol)", "mont": "Montagem (Vol)"}
+
+CENARIOS_POR_LOTE = 64
+MAX_WORKERS_PLANO = 4
+
+_DIA_NS = 86_400 * 10**9
+_SEMANA_NS = 7 * _DIA_NS
+# 01/01/1970 foi uma quinta-feira: somando 3 dias, dia // 7 cai na segunda da semana
+_DESLOC_SEGUNDA = 3
+
+# ========================================================
+#     PERFIS DE CRONOGRAMA (UM POR REFERÊNCIA)
+# ========================================================
+def perfis_das_obras(df_datas):
+    # df_datas: índice Obra, colunas ini_/fim_ de cada etapa
+    def dias(fim, ini):
+        return (df_datas[fim] - df_datas[ini]).dt.days
+    return pd.DataFrame({
+        'dias_duracao_proj': dias('fim_proj', 'ini_proj'),
+        'dias_lag_fab': dias('ini_fab', 'ini_proj'),
+        'dias_duracao_fab': dias('fim_fab', 'ini_fab'),
+        'dias_lag_mont': dias('ini_mont', 'ini_proj'),
+        'dias_duracao_mont': dias('fim_mont', 'ini_mont'),
+    }, index=df_datas.index).astype(float)
+
+def datas_das_etapas(perfis, inicio):
+    # Início/fim de cada etapa por cenário, em ns desde 1970 (NaN = etapa sem dados)
+    ini_p = pd.Timestamp(inicio).value
+    d = perfis[COLS_PERFIL].to_numpy(dtype=float) * _DIA_NS
+    ini = {"proj": np.full(len(perfis), float(ini_p)), "fab": ini_p + d[:, 1], "mont": ini_p + d[:, 3]}
+    fim = {"proj": ini_p + d[:, 0], "fab": ini["fab"] + d[:, 2], "mont": ini["mont"] + d[:, 4]}
+    return ini, fim
+
+# ========================================================
+#     CURVA DE PRODUÇÃO DA NOVA OBRA (POR FAMÍLIA)
+# ========================================================
+def combinar_curvas(df_curvas, df_familias_input):
+    # Média das curvas S das famílias ponderada pelo volume digitado (ou pela quantidade,
+    # se nenhum volume foi informado). Família sem histórico entra com avanço linear.
+    pesos = df_familias_input.set_index('Familia')['Volume'].astype(float)
+    if pesos.sum() <= 0:
+        pesos = df_familias_input.set_index('Familia')['Quantidade'].astype(float)
+    pesos = pesos[pesos > 0]
+    if pesos.empty:
+        return None
+    qtd_pontos = df_curvas.shape[1] if len(df_curvas) else 2
+    linear = np.linspace(0.0, 1.0, qtd_pontos)
+    idx = pd.MultiIndex.from_product([pesos.index, list(ETAPAS_PLANO)], names=['Familia', 'Etapa'])
+    curvas = df_curvas.reindex(idx).to_numpy(dtype=float).reshape(len(pesos), len(ETAPAS_PLANO), qtd_pontos)
+    curvas = np.where(np.isnan(curvas), linear, curvas)
+    return np.tensordot(pesos.to_numpy() / pesos.sum(), curvas, axes=1)
+
+# ========================================================
+#     MOTOR DE CALENDÁRIO (VETORIZADO)
+# ========================================================
+# Cada etapa ocupa as semanas da segunda-feira do início até o fim; o volume é
+# dividido igualmente entre elas ou, com curvas, segue a curva S combinada das
+# famílias. Em vez de gerar listas de semanas e testar pertinência linha a linha,
+# cada etapa vira um intervalo [k, k + n) sobre um eixo de semanas comum a todos
+# os cenários do lote.
+def _intervalo_semanas(ini_ns, fim_ns):
+    valido = ~(np.isnan(ini_ns) | np.isnan(fim_ns))
+    ini = np.where(valido, ini_ns, 0).astype(np.int64)
+    fim = np.where(valido, fim_ns, 0).astype(np.int64)
+    # Segunda-feira da semana do início, mantendo a hora (como o laço original)
+    dia_semana = (np.floor_divide(ini, _DIA_NS) + _DESLOC_SEGUNDA) % 7
+    segunda = ini - dia_semana * _DIA_NS
+    qtd = np.where(valido & (fim >= segunda), (fim - segunda) // _SEMANA_NS + 1, 0)
+    # Semana do calendário = segunda-feira à meia-noite
+    semana = np.floor_divide(segunda, _DIA_NS)
+    return semana, qtd
+
+def _projetar_lote(perfis, inicio, total_vol, curvas=None):
+    ini, fim = datas_das_etapas(perfis, inicio)
+    intervalos = {etapa: _intervalo_semanas(ini[etapa], fim[etapa]) for etapa in ETAPAS_PLANO}
+
+    usadas = [(semana[qtd > 0], qtd[qtd > 0]) for semana, qtd in intervalos.values()]
+    if not any(len(semana) for semana, _ in usadas):
+        return pd.DataFrame(columns=['Cenario', 'Semana'] + list(ETAPAS_PLANO.values()))
+    dia0 = min(semana.min() for semana, _ in usadas if len(semana))
+    qtd_semanas = int(max(((semana - dia0) // 7 + qtd).max() for semana, qtd in usadas if len(semana)))
+
+    eixo = np.arange(qtd_semanas)
+    ativo_algum = np.zeros((len(perfis), qtd_semanas), dtype=bool)
+    acumulados = {}
+    for i, (etapa, (semana, qtd)) in enumerate(intervalos.items()):
+        k = (semana - dia0) // 7
+        ativo = (eixo >= k[:, None]) & (eixo < (k + qtd)[:, None])
+        # Fração do período da etapa já cumprida ao fim de cada semana: 1/n, 2/n, ..., 1
+        decorrido = np.clip((eixo - k[:, None] + 1) / np.maximum(qtd, 1)[:, None], 0.0, 1.0)
+        if curvas is not None:
+            decorrido = np.interp(decorrido, np.linspace(0.0, 1.0, curvas.shape[1]), curvas[i])
+        acumulados[ETAPAS_PLANO[etapa]] = total_vol * decorrido * (qtd > 0)[:, None]
+        ativo_algum |= ativo
+
+    # Só as semanas em que alguma etapa está ativa (mesma união de semanas do planejador original)
+    linhas, colunas = np.nonzero(ativo_algum)
+    df = pd.DataFrame({
+        'Cenario': perfis.index.to_numpy()[linhas],
+        'Semana': pd.to_datetime((dia0 + colunas * 7) * _DIA_NS),
+    })
+    for col, matriz in acumulados.items():
+        df[col] = matriz[linhas, colunas]
+    return df
+
+def projetar_cenarios(perfis, inicio, total_vol, curvas=None, max_workers=MAX_WORKERS_PLANO):
+    # Vários cenários numa chamada; lotes grandes são divididos entre threads (o NumPy solta o GIL)
+    if len(perfis) <= CENARIOS_POR_LOTE:
+        return _projetar_lote(perfis, inicio, total_vol, curvas)
+    lotes = [perfis.iloc[i:i + CENARIOS_POR_LOTE] for i in range(0, len(perfis), CENARIOS_POR_LOTE)]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planejador") as executor:
+        partes = list(executor.map(lambda lote: _projetar_lote(lote, inicio, total_vol, curvas), lotes))
+    return pd.concat(partes, ignore_index=True)
+
+def resumir_cenarios(perfis, inicio):
+    # Uma linha por cenário com as datas de cada etapa, para comparar as referências lado a lado
+    ini, fim = datas_das_etapas(perfis, inicio)
+    resumo = pd.DataFrame(index=perfis.index)
+    for etapa, nome in [("proj", "Projeto"), ("fab", "Fabricação"), ("mont", "Montagem")]:
+        resumo[f"Início {nome}"] = pd.to_datetime(ini[etapa]).normalize()
+        resumo[f"Fim {nome}"] = pd.to_datetime(fim[etapa]).normalize()
+    resumo["Duração Total (dias)"] = (resumo[["Fim Projeto", "Fim Fabricação", "Fim Montagem"]].max(axis=1) - resumo["Início Projeto"]).dt.days
+    return resumo.rename_axis('Referência').reset_index()
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+COLS_VOLUME = ['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']
+
+# ========================================================
+#     ESQUEMA TIPADO DOS FRAMES SEMANAIS
+# ========================================================
+# Obra categórica, volumes float32 e semanas datetime64: o semanal ocupa uma fração
+# do que ocupava com strings object e float64 em cada cópia por sessão.
+def tipar_semanal(df):
+    df = df.copy()
+    df['Obra'] = df['Obra'].astype(pd.CategoricalDtype(sorted(df['Obra'].dropna().unique())))
+    df['Semana'] = pd.to_datetime(df['Semana'])
+    df[COLS_VOLUME] = df[COLS_VOLUME].astype(np.float32)
+    return df
+
+# ========================================================
+#     PREENCHIMENTO DE LACUNAS + ACUMULADO (VETORIZADO)
+# ========================================================
+# Para cada obra: semanas de margem zeradas antes da primeira e depois da última
+# semana com dados, todas as semanas intermediárias presentes (passo de 7 dias)
+# e os volumes acumulados. Tudo em uma única passada sobre um MultiIndex Obra x Semana.
+def montar_acumulado_semanal(df_base, obras, semanas_margem=10):
+    df = df_base[df_base['Obra'].isin(obras)]
+    if df.empty:
+        return pd.DataFrame(columns=['Obra', 'Semana'] + COLS_VOLUME)
+
+    semanal = df.groupby(['Obra', 'Semana'], observed=True)[COLS_VOLUME].sum()
+    semanas_obra = semanal.index.get_level_values('Semana')
+    limites = semanas_obra.to_series(index=semanal.index.get_level_values('Obra')).groupby(level=0).agg(['min', 'max'])
+
+    passo = np.timedelta64(7, 'D')
+    inicio = (limites['min'] - pd.Timedelta(weeks=semanas_margem)).to_numpy()
+    qtd_semanas = ((limites['max'] - limites['min']).to_numpy() // passo) + 1 + 2 * semanas_margem
+
+    # Posição de cada linha dentro do bloco da sua obra: 0, 1, ..., qtd_semanas - 1
+    deslocamento = np.arange(qtd_semanas.sum()) - np.repeat(np.cumsum(qtd_semanas) - qtd_semanas, qtd_semanas)
+    idx_completo = pd.MultiIndex.from_arrays(
+        [np.repeat(limites.index.to_numpy(), qtd_semanas), np.repeat(inicio, qtd_semanas) + deslocamento * passo],
+        names=['Obra', 'Semana']
+    )
+
+    # Soma em float64 (sem erro de arredondamento acumulado) e guarda em float32
+    acumulado = semanal.astype(np.float64).reindex(idx_completo, fill_value=0.0).groupby(level='Obra').cumsum()
+    acumulado = acumulado.astype(np.float32).reset_index()
+    acumulado['Obra'] = acumulado['Obra'].astype(df['Obra'].dtype)
+    return acumulado
+
+# ========================================================
+#     PREVISÕES: REPETE O ÚLTIMO VALOR ATÉ CHEGAR A 100%
+# ========================================================
+COLS_PREVISAO = ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]
+
+def _derivar_previsoes(valores, inicios):
+    # valores: previsões digitadas (linhas por obra e semana); inicios: 1ª linha de cada obra.
+    # 0 e vazio repetem o último valor da mesma obra; depois de uma semana em 100% ou mais
+    # a previsão fica vazia (a linha do gráfico para ali).
+    n = len(valores)
+    if n == 0:
+        return valores.copy()
+    preenchido = np.where(valores == 0.0, np.nan, valores)
+    inicio_linha = np.repeat(inicios, np.diff(np.append(inicios, n)))[:, None]
+    ultima = np.where(np.isnan(preenchido), -1, np.arange(n)[:, None])
+    ultima = np.maximum.accumulate(ultima, axis=0)
+    valida = ultima >= inicio_linha
+    saida = np.where(valida, np.take_along_axis(preenchido, np.maximum(ultima, 0), axis=0), np.nan)
+    saida = np.nan_to_num(saida, nan=0.0)
+    anterior = np.vstack([np.full((1, valores.shape[1]), np.nan), saida[:-1]])
+    anterior[inicios] = np.nan
+    saida[anterior >= 100.0] = np.nan
+    return saida
+
+def _blocos_obra(df):
+    # df ordenado por obra e semana: posição da 1ª linha de cada obra
+    codigos, obras = pd.factorize(df['Obra'])
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]]) if len(codigos) else np.array([], dtype=np.intp)
+    return list(obras), inicios
+
+def calcular_previsoes(df_editado):
+    df_calculado = df_editado.sort_values(['Obra', 'Semana'])
+    _, inicios = _blocos_obra(df_calculado)
+    valores = df_calculado[COLS_PREVISAO].to_numpy(dtype=np.float64)
+    df_calculado[COLS_PREVISAO] = _derivar_previsoes(valores, inicios)
+    return df_calculado
+
+def _hash_obras(valores, inicios):
+    # Um hash por obra das previsões digitadas (sensível à ordem das semanas)
+    if len(valores) == 0:
+        return np.array([], dtype=np.uint64)
+    linhas = pd.util.hash_pandas_object(pd.DataFrame(valores), index=False).to_numpy()
+    return np.add.reduceat(linhas * np.arange(1, len(linhas) + 1, dtype=np.uint64), inicios)
+
+class MotorPrevisoes:
+    # Guarda as previsões derivadas do último cálculo. Se as linhas (obras, semanas e
+    # versão da base) são as mesmas, só as obras cujas previsões digitadas mudaram (pelo
+    # hash da obra ou marcadas em obras_alteradas) são recalculadas; as outras vêm prontas
+    # do cálculo anterior.
+    def __init__(self):
+        self.chave = None
+        self.hashes = None
+        self.saida = None
+
+    def calcular(self, df_editado, versao_base, obras_alteradas=()):
+        df_calculado = df_editado.sort_values(['Obra', 'Semana'])
+        obras, inicios = _blocos_obra(df_calculado)
+        semanas = df_calculado['Semana'].to_numpy()
+        fins = np.append(inicios[1:], len(df_calculado))
+        chave = (versao_base, tuple(obras), tuple(fins - inicios), semanas[inicios].tobytes())
+        valores = df_calculado[COLS_PREVISAO].to_numpy(dtype=np.float64)
+        hashes = _hash_obras(valores, inicios)
+
+        if chave != self.chave:
+            saida = _derivar_previsoes(valores, inicios)
+        else:
+            saida = self.saida.copy()
+            alteradas = set(obras_alteradas)
+            for obra, ini, fim, mudou in zip(obras, inicios, fins, hashes != self.hashes):
+                if mudou or obra in alteradas:
+                    saida[ini:fim] = _derivar_previsoes(valores[ini:fim], np.array([0]))
+        self.chave, self.hashes, self.saida = chave, hashes, saida
+
+        df_calculado[COLS_PREVISAO] = saida
+        return df_calculado
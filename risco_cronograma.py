@@ -0,0 +1,161 @@
+import argparse
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from planejador import COLS_PERFIL, perfis_das_obras
+
+CENARIOS_PADRAO = 100_000
+PERCENTIS = [50, 80, 95]
+LOTE_CENARIOS = 32_768   # cenários por bloco no leque (limita a memória temporária)
+FAIXAS_LEQUE = 100       # resolução do leque: 1% do volume
+SEMENTE = 42
+
+# Fim de cada etapa em dias após o início do projeto, a partir das colunas do perfil
+ETAPAS_RISCO = {
+    "Projeto": (None, 'dias_duracao_proj'),
+    "Fabricação": ('dias_lag_fab', 'dias_duracao_fab'),
+    "Montagem": ('dias_lag_mont', 'dias_duracao_mont'),
+}
+
+# ========================================================
+#     PERFIS HISTÓRICOS (POR OBRA)
+# ========================================================
+def perfis_historicos(df_datas):
+    # Mesmo recorte das médias do cronograma: obras com as três etapas iniciadas, datas sem hora
+    df = df_datas.dropna(subset=['ini_proj', 'ini_fab', 'ini_mont'])
+    return perfis_das_obras(df.apply(lambda s: s.dt.normalize())).dropna()
+
+# ========================================================
+#     AMOSTRAGEM (BOOTSTRAP SUAVIZADO)
+# ========================================================
+# Cada cenário sorteia uma obra do histórico inteira (mantém a correlação entre
+# durações e defasagens da mesma obra) e soma um ruído gaussiano com a largura de
+# banda de Silverman, para não repetir só os poucos cronogramas já vistos.
+def amostrar_perfis(perfis, n_cenarios, semente=SEMENTE):
+    base = perfis[COLS_PERFIL].to_numpy(dtype=np.float32)
+    if len(base) == 0:
+        raise ValueError("Nenhuma obra com histórico completo para simular.")
+    rng = np.random.default_rng(semente)
+    banda = (1.06 * base.std(axis=0) * len(base) ** -0.2).astype(np.float32)
+    amostra = base[rng.integers(0, len(base), n_cenarios)]
+    amostra += rng.standard_normal((n_cenarios, len(COLS_PERFIL)), dtype=np.float32) * banda
+    # Durações não ficam negativas (defasagens podem: fabricação antes do projeto acontece)
+    duracoes = [COLS_PERFIL.index(c) for c in COLS_PERFIL if c.startswith('dias_duracao')]
+    np.maximum(amostra[:, duracoes], 0, out=amostra[:, duracoes])
+    return amostra
+
+def intervalos_etapas(amostra):
+    # (início, fim) de cada etapa em dias após o início do projeto
+    col = {c: amostra[:, i] for i, c in enumerate(COLS_PERFIL)}
+    intervalos = {}
+    for etapa, (lag, duracao) in ETAPAS_RISCO.items():
+        ini = col[lag] if lag else np.zeros(len(amostra), dtype=np.float32)
+        intervalos[etapa] = (ini, ini + col[duracao])
+    return intervalos
+
+# ========================================================
+#     RESULTADOS: PERCENTIS E LEQUE DE VOLUME ACUMULADO
+# ========================================================
+def percentis_fim(intervalos, inicio):
+    inicio = pd.Timestamp(inicio).normalize()
+    linhas = []
+    for etapa, (_, fim) in intervalos.items():
+        dias = np.percentile(fim, PERCENTIS)
+        linhas.append({'Etapa': etapa, **{f"P{p}": inicio + pd.Timedelta(days=int(np.ceil(d))) for p, d in zip(PERCENTIS, dias)}})
+    return pd.DataFrame(linhas)
+
+def leque_volume(intervalos, inicio, total_vol, curvas=None, quantis=(0.05, 0.2, 0.5, 0.8, 0.95)):
+    # Avanço linear dentro de cada etapa (o volume é distribuído igual entre as semanas).
+    # Em vez de guardar cenários x semanas, cada bloco vira um histograma de faixas de 1%
+    # por semana; os quantis saem do histograma acumulado. Antes do 1º percentil dos
+    # inícios todos os quantis são 0, depois do 99º dos fins são o total: só as semanas
+    # entre os dois passam pelo histograma. A curva S é monótona: aplicada depois dos
+    # quantis dá o mesmo resultado que aplicada cenário a cenário.
+    inicio = pd.Timestamp(inicio).normalize()
+    n_cenarios = len(next(iter(intervalos.values()))[0])
+    fim_max = max(float(np.percentile(fim, 99)) for _, fim in intervalos.values())
+    dias = np.arange(0, fim_max + 7, 7, dtype=np.float32)
+
+    linhas = []
+    for i_etapa, (etapa, (ini, fim)) in enumerate(intervalos.items()):
+        volumes = np.zeros((len(quantis), len(dias)))
+        primeira, ultima = np.searchsorted(dias, [np.percentile(ini, 1), np.percentile(fim, 99)])
+        volumes[:, ultima:] = total_vol
+        janela = dias[primeira:ultima]
+        if len(janela):
+            contagem = np.zeros(len(janela) * (FAIXAS_LEQUE + 1), dtype=np.int64)
+            deslocamento = (np.arange(len(janela)) * (FAIXAS_LEQUE + 1))[None, :]
+            for i in range(0, n_cenarios, LOTE_CENARIOS):
+                a, b = ini[i:i + LOTE_CENARIOS, None], fim[i:i + LOTE_CENARIOS, None]
+                frac = np.clip((janela[None, :] - a) / np.maximum(b - a, 1.0), 0.0, 1.0)
+                faixa = (frac * FAIXAS_LEQUE).astype(np.intp)
+                faixa += deslocamento
+                contagem += np.bincount(faixa.ravel(), minlength=len(contagem))
+            acumulado = contagem.reshape(len(janela), FAIXAS_LEQUE + 1).cumsum(axis=1)
+            for j, q in enumerate(quantis):
+                decorrido = (acumulado >= q * n_cenarios).argmax(axis=1) / FAIXAS_LEQUE
+                if curvas is not None:
+                    decorrido = np.interp(decorrido, np.linspace(0.0, 1.0, curvas.shape[1]), curvas[i_etapa])
+                volumes[j, primeira:ultima] = decorrido * total_vol
+        df = pd.DataFrame(volumes.T, columns=[f"P{int(q * 100)}" for q in quantis])
+        df.insert(0, 'Etapa', etapa)
+        df.insert(0, 'Semana', inicio + pd.to_timedelta(dias, unit='D'))
+        linhas.append(df)
+    return pd.concat(linhas, ignore_index=True)
+
+def grafico_leque(df_leque):
+    base = alt.Chart(df_leque).encode(
+        x=alt.X('Semana:T', title='Semana'),
+        color=alt.Color('Etapa:N', scale=alt.Scale(scheme='category10'), title='Etapa'),
+    )
+    externo = base.mark_area(opacity=0.15).encode(y=alt.Y('P5:Q', title='Volume acumulado (m³)'), y2='P95:Q')
+    interno = base.mark_area(opacity=0.3).encode(y='P20:Q', y2='P80:Q')
+    mediana = base.mark_line(strokeWidth=2).encode(
+        y='P50:Q',
+        tooltip=['Etapa', alt.Tooltip('Semana:T', format='%d/%m/%Y'),
+                 alt.Tooltip('P5:Q', format='.1f'), alt.Tooltip('P50:Q', format='.1f'), alt.Tooltip('P95:Q', format='.1f')]
+    )
+    return (externo + interno + mediana).properties(height=350).interactive()
+
+def simular_risco(perfis, inicio, total_vol, n_cenarios=CENARIOS_PADRAO, curvas=None, semente=SEMENTE):
+    inicio_exec = time.perf_counter()
+    intervalos = intervalos_etapas(amostrar_perfis(perfis, n_cenarios, semente))
+    df_percentis = percentis_fim(intervalos, inicio)
+    df_leque = leque_volume(intervalos, inicio, total_vol, curvas)
+    return df_percentis, df_leque, time.perf_counter() - inicio_exec
+
+# ========================================================
+#     BENCHMARK
+# ========================================================
+# Uso: python risco_cronograma.py --cenarios 200000 --obras 40
+def _perfis_sinteticos(n_obras, semente=SEMENTE):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'dias_duracao_proj': rng.gamma(4, 30, n_obras),
+        'dias_lag_fab': rng.gamma(3, 20, n_obras),
+        'dias_duracao_fab': rng.gamma(5, 35, n_obras),
+        'dias_lag_mont': rng.gamma(4, 40, n_obras),
+        'dias_duracao_mont': rng.gamma(5, 40, n_obras),
+    }, index=[f"Obra {i}" for i in range(n_obras)])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da simulação de risco do cronograma.")
+    parser.add_argument("--cenarios", type=int, default=CENARIOS_PADRAO)
+    parser.add_argument("--obras", type=int, default=40, help="obras sintéticas no histórico")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    perfis = _perfis_sinteticos(args.obras)
+    simular_risco(perfis, pd.Timestamp.today(), 1000.0, 1000)  # aquece
+    tempos = []
+    for i in range(args.repeticoes):
+        df_percentis, _, segundos = simular_risco(perfis, pd.Timestamp.today(), 1000.0, args.cenarios, semente=i)
+        tempos.append(segundos)
+    print(df_percentis.to_string(index=False))
+    print(f"{args.cenarios} cenários: mediana {np.median(tempos) * 1000:.0f} ms | melhor {min(tempos) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
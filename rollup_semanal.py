@@ -0,0 +1,184 @@
+import argparse
+import datetime
+import time
+
+import pandas as pd
+
+import banco
+from carregamento import OBRAS_UNIFICADAS, COLUNA_WATERMARK, ler_watermark
+
+# ========================================================
+#     ROLLUP SEMANAL MATERIALIZADO (plannix_semanal)
+# ========================================================
+# Só o semanal da base completa: o job mantém Obra x Semana com os volumes e o painel lê
+# essa tabela no lugar de agregar a extração quando ela ainda não está carregada no
+# processo (nem em snapshot). Catálogo, totais e famílias não saem daqui (ver
+# carregamento.ler_rollup_semanal).
+#
+# Uso:
+#   python rollup_semanal.py                 -> uma atualização (incremental quando possível)
+#   python rollup_semanal.py --completa      -> recria tudo
+#   python rollup_semanal.py --intervalo 300 -> fica rodando a cada 300 s
+RECARGA_COMPLETA_HORAS = 24  # pega peças excluídas, que o watermark não enxerga
+
+DDL_ROLLUP = """
+    CREATE TABLE IF NOT EXISTS `plannix_semanal` (
+        `Obra` VARCHAR(255) NOT NULL,
+        `Semana` DATE NOT NULL,
+        `Volume_Projetado` DOUBLE NOT NULL DEFAULT 0,
+        `Volume_Fabricado` DOUBLE NOT NULL DEFAULT 0,
+        `Volume_Montado` DOUBLE NOT NULL DEFAULT 0,
+        PRIMARY KEY (`Obra`, `Semana`)
+    )
+"""
+
+DDL_CONTROLE = """
+    CREATE TABLE IF NOT EXISTS `plannix_semanal_controle` (
+        `id` TINYINT NOT NULL PRIMARY KEY,
+        `watermark` VARCHAR(64) NULL,
+        `atualizado_em` DATETIME NOT NULL,
+        `recarga_completa_em` DATETIME NOT NULL
+    )
+"""
+
+def _obra_unificada_sql():
+    casos = " ".join(f"WHEN '{bruto}' THEN '{destino}'" for bruto, destino in OBRAS_UNIFICADAS.items())
+    return f"CASE nomeObra {casos} ELSE nomeObra END" if casos else "nomeObra"
+
+# Só os volumes semanais: o acumulado é refeito no painel junto com o preenchimento
+# das semanas sem produção (montar_acumulado_semanal)
+QUERY_MATERIALIZAR = """
+    INSERT INTO `plannix_semanal` (Obra, Semana, Volume_Projetado, Volume_Fabricado, Volume_Montado)
+    SELECT
+        Obra, Semana_Inicio AS Semana,
+        SUM(Volume_Projetado) AS Volume_Projetado,
+        SUM(Volume_Fabricado) AS Volume_Fabricado,
+        SUM(Volume_Montado) AS Volume_Montado
+    FROM (
+        SELECT
+            {obra} AS Obra,
+            CAST(DATE_SUB(data_Projeto, INTERVAL WEEKDAY(data_Projeto) DAY) AS DATE) AS Semana_Inicio,
+            volumeProjetado AS Volume_Projetado, 0 AS Volume_Fabricado, 0 AS Volume_Montado
+        FROM `plannix-db`.`plannix` WHERE data_Projeto IS NOT NULL AND volumeProjetado > 0 {filtro}
+        UNION ALL
+        SELECT
+            {obra} AS Obra,
+            CAST(DATE_SUB(data_Acabamento, INTERVAL WEEKDAY(data_Acabamento) DAY) AS DATE) AS Semana_Inicio,
+            0 AS Volume_Projetado, volumeFabricado AS Volume_Fabricado, 0 AS Volume_Montado
+        FROM `plannix-db`.`plannix` WHERE data_Acabamento IS NOT NULL AND volumeFabricado > 0 {filtro}
+        UNION ALL
+        SELECT
+            {obra} AS Obra,
+            CAST(DATE_SUB(dataMontada, INTERVAL WEEKDAY(dataMontada) DAY) AS DATE) AS Semana_Inicio,
+            0 AS Volume_Projetado, 0 AS Volume_Fabricado, volumeMontado AS Volume_Montado
+        FROM `plannix-db`.`plannix` WHERE dataMontada IS NOT NULL AND volumeMontado > 0 {filtro}
+    ) AS dados
+    GROUP BY Obra, Semana_Inicio
+"""
+
+# Tabelas criadas antes guardavam também o acumulado (Acum_*), que o painel nunca leu
+COLS_LEGADAS = ["Acum_Projetado", "Acum_Fabricado", "Acum_Montado"]
+
+def _remover_colunas_legadas(conn):
+    df = pd.read_sql(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'plannix_semanal'", conn
+    )
+    legadas = [c for c in COLS_LEGADAS if c in set(df['COLUMN_NAME'])]
+    if legadas:
+        conn.exec_driver_sql("ALTER TABLE `plannix_semanal` " + ", ".join(f"DROP COLUMN `{c}`" for c in legadas))
+
+def _marcadores(valores):
+    return ", ".join(["%s"] * len(valores))
+
+def materializar(conn, obras_brutas=None):
+    if obras_brutas is None:
+        conn.exec_driver_sql(QUERY_MATERIALIZAR.format(obra=_obra_unificada_sql(), filtro=""))
+        return
+    filtro = f"AND nomeObra IN ({_marcadores(obras_brutas)})"
+    conn.exec_driver_sql(
+        QUERY_MATERIALIZAR.format(obra=_obra_unificada_sql(), filtro=filtro),
+        tuple(obras_brutas) * 3
+    )
+
+def obras_afetadas(obras_alteradas):
+    # Uma obra unificada só pode ser recalculada com todas as obras brutas que a compõem
+    unificadas = {OBRAS_UNIFICADAS.get(o, o) for o in obras_alteradas}
+    brutas = set(unificadas) | {bruto for bruto, destino in OBRAS_UNIFICADAS.items() if destino in unificadas}
+    return sorted(unificadas), sorted(brutas)
+
+def _ler_controle(conn):
+    df = pd.read_sql("SELECT watermark, recarga_completa_em FROM `plannix_semanal_controle` WHERE id = 1", conn)
+    return None if df.empty else df.iloc[0]
+
+def _gravar_controle(conn, watermark, completa):
+    agora = datetime.datetime.now()
+    conn.exec_driver_sql(
+        """
+        INSERT INTO `plannix_semanal_controle` (id, watermark, atualizado_em, recarga_completa_em)
+        VALUES (1, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            watermark = VALUES(watermark),
+            atualizado_em = VALUES(atualizado_em),
+            recarga_completa_em = IF(%s, VALUES(recarga_completa_em), recarga_completa_em)
+        """,
+        (None if watermark is None else str(watermark), agora, agora, completa)
+    )
+
+# ========================================================
+#     JOB DE ATUALIZAÇÃO
+# ========================================================
+def atualizar_rollup(forcar_completa=False):
+    inicio = time.perf_counter()
+    with banco.transacao() as conn:
+        conn.exec_driver_sql(DDL_ROLLUP)
+        conn.exec_driver_sql(DDL_CONTROLE)
+        _remover_colunas_legadas(conn)
+
+    with banco.transacao() as conn:
+        controle = _ler_controle(conn)
+        # Lido antes dos dados: o que mudar durante a atualização entra na próxima
+        novo_watermark = ler_watermark(conn)
+        completa = (
+            forcar_completa or controle is None or not COLUNA_WATERMARK
+            or pd.isna(controle['watermark'])
+            or datetime.datetime.now() - controle['recarga_completa_em'] >= datetime.timedelta(hours=RECARGA_COMPLETA_HORAS)
+        )
+
+        if completa:
+            conn.exec_driver_sql("DELETE FROM `plannix_semanal`")
+            materializar(conn)
+            resumo = "completa"
+        else:
+            df_obras = pd.read_sql(
+                f"SELECT DISTINCT nomeObra FROM `plannix-db`.`plannix` WHERE `{COLUNA_WATERMARK}` > %s",
+                conn, params=(controle['watermark'],)
+            )
+            obras_alteradas = df_obras['nomeObra'].dropna().tolist()
+            if obras_alteradas:
+                unificadas, brutas = obras_afetadas(obras_alteradas)
+                conn.exec_driver_sql(
+                    f"DELETE FROM `plannix_semanal` WHERE Obra IN ({_marcadores(unificadas)})", tuple(unificadas)
+                )
+                materializar(conn, brutas)
+            resumo = f"incremental ({len(obras_alteradas)} obras)"
+
+        _gravar_controle(conn, novo_watermark, completa)
+    return f"{resumo} em {time.perf_counter() - inicio:.2f}s"
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza a tabela plannix_semanal.")
+    parser.add_argument("--completa", action="store_true", help="recria o rollup inteiro")
+    parser.add_argument("--intervalo", type=int, default=0, help="segundos entre execuções (0 = roda uma vez)")
+    args = parser.parse_args()
+
+    print(f"[{datetime.datetime.now():%H:%M:%S}] plannix_semanal: {atualizar_rollup(args.completa)}")
+    while args.intervalo > 0:
+        time.sleep(args.intervalo)
+        try:
+            print(f"[{datetime.datetime.now():%H:%M:%S}] plannix_semanal: {atualizar_rollup()}")
+        except Exception as e:
+            print(f"[{datetime.datetime.now():%H:%M:%S}] Erro ao atualizar plannix_semanal: {e}")
+
+if __name__ == "__main__":
+    main()
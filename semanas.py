@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Faixa coberta pelo calendário; semanas fora dela (ou que não começam na segunda)
+# caem no formatador linha a linha
+PRIMEIRA_SEMANA = "2000-01-03"
+ULTIMA_SEMANA = "2060-12-27"
+
+# ========================================================
+#     CALENDÁRIO DE SEMANAS (DIMENSÃO)
+# ========================================================
+# Uma linha por semana (segunda-feira), com o rótulo de exibição, a semana e o ano
+# ISO. Os frames semanais e o planejador só procuram a semana aqui: o rótulo é
+# formatado uma vez por processo, não a cada linha e a cada rerun.
+def formatar_semana(date):
+    if pd.isna(date): return None
+    if isinstance(date, str):
+        try: date = pd.to_datetime(date)
+        except: return date
+    start_str = date.strftime('%d/%m')
+    end_str = (date + pd.Timedelta(days=6)).strftime('%d/%m')
+    return f"{start_str} á {end_str} ({date.strftime('%Y')})"
+
+def montar_calendario(primeira=PRIMEIRA_SEMANA, ultima=ULTIMA_SEMANA):
+    semanas = pd.date_range(primeira, ultima, freq="W-MON", name="Semana")
+    iso = semanas.isocalendar()
+    rotulo = semanas.strftime('%d/%m') + ' á ' + (semanas + pd.Timedelta(days=6)).strftime('%d/%m') + semanas.strftime(' (%Y)')
+    return pd.DataFrame({
+        'Semana_Display': rotulo,
+        'Semana_ISO': iso['week'].to_numpy(dtype=np.int16),
+        'Ano_ISO': iso['year'].to_numpy(dtype=np.int16),
+    }, index=semanas)
+
+@st.cache_resource
+def calendario_semanas():
+    return montar_calendario()
+
+def _categorico(codigos, rotulos):
+    # Valores distintos podem dar o mesmo rótulo (hora fora da meia-noite, mesmo dd/mm em
+    # anos diferentes): as categorias saem dos rótulos, sem repetição
+    codigos_rotulo, categorias = pd.factorize(np.asarray(rotulos, dtype=object))
+    return pd.Categorical.from_codes(np.where(codigos >= 0, codigos_rotulo[codigos], -1), categorias)
+
+def rotular_semanas(semanas):
+    # Categórico com um rótulo por semana distinta, buscado no calendário
+    codigos, unicas = pd.factorize(semanas)
+    calendario = calendario_semanas()
+    posicoes = calendario.index.get_indexer(pd.DatetimeIndex(unicas))
+    rotulos = calendario['Semana_Display'].to_numpy()[posicoes]
+    faltando = posicoes < 0
+    if faltando.any():
+        rotulos[faltando] = [formatar_semana(s) for s in unicas[faltando]]
+    return _categorico(codigos, rotulos)
+
+def rotular_intervalos(inicio, fim):
+    # "dd/mm a dd/mm" do War Room (o fim vem da API): cada par distinto é formatado uma vez
+    pares = pd.MultiIndex.from_arrays([pd.to_datetime(inicio), pd.to_datetime(fim)])
+    codigos, unicos = pares.factorize()
+    rotulos = unicos.get_level_values(0).strftime('%d/%m') + ' a ' + unicos.get_level_values(1).strftime('%d/%m')
+    return _categorico(codigos, rotulos)
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Diretório local dos snapshots; sobrevive a restart/deploy se estiver num volume persistente
+DIR_SNAPSHOTS = Path(st.secrets.get("diretorio_snapshots", ".snapshots"))
+CHAVE_META = b"snapshot"
+
+_lock_escrita = threading.Lock()
+
+# ========================================================
+#     SNAPSHOTS EM DISCO (ARROW IPC)
+# ========================================================
+# O resultado de cada fonte cara é gravado em Arrow IPC ao ser atualizado. Num
+# processo novo a leitura é por memory-map: as colunas numéricas apontam direto
+# para o arquivo, sem parse. A gravação vai para um temporário e troca de nome no
+# fim, então um restart no meio da escrita nunca deixa um arquivo pela metade.
+def _caminho(nome, extensao):
+    return DIR_SNAPSHOTS / f"{nome}.{extensao}"
+
+def _trocar_arquivo(caminho, escrever):
+    DIR_SNAPSHOTS.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with _lock_escrita:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+
+def salvar_frame(nome, df, meta=None):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[CHAVE_META] = json.dumps({"salvo_em": time.time(), **(meta or {})}).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    def escrever(caminho):
+        with pa.OSFile(str(caminho), "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    _trocar_arquivo(_caminho(nome, "arrow"), escrever)
+
+def ler_frame(nome):
+    # (df, meta) ou None se não houver snapshot legível
+    try:
+        tabela = pa.ipc.open_file(pa.memory_map(str(_caminho(nome, "arrow")), "r")).read_all()
+        meta = json.loads((tabela.schema.metadata or {}).get(CHAVE_META, b"{}"))
+        return tabela.to_pandas(split_blocks=True), meta
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+def existe_frame(nome):
+    return _caminho(nome, "arrow").exists()
+
+def salvar_json(nome, dados, meta=None):
+    conteudo = json.dumps({"salvo_em": time.time(), **(meta or {}), "dados": dados}, ensure_ascii=False)
+
+    def escrever(caminho):
+        caminho.write_text(conteudo, encoding="utf-8")
+    _trocar_arquivo(_caminho(nome, "json"), escrever)
+
+def ler_json(nome):
+    # Payloads pequenos (APIs): JSON puro, com as mesmas metas do snapshot de frames
+    try:
+        return json.loads(_caminho(nome, "json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def gravar_em_segundo_plano(funcao, *args, **kwargs):
+    # A gravação não segura quem acabou de atualizar os dados; uma falha de disco só perde o snapshot
+    def tarefa():
+        try:
+            funcao(*args, **kwargs)
+        except Exception:
+            pass
+    threading.Thread(target=tarefa, daemon=True, name="snapshot").start()
+
+# --- Watermark do plannix: datetime ou inteiro, guardado com o tipo no JSON ---
+def watermark_para_json(watermark):
+    if watermark is None:
+        return None
+    if hasattr(watermark, "isoformat"):
+        return {"tipo": "data", "valor": watermark.isoformat()}
+    return {"tipo": "numero", "valor": watermark}
+
+def watermark_de_json(valor):
+    if not valor:
+        return None
+    if valor["tipo"] == "data":
+        return pd.Timestamp(valor["valor"]).to_pydatetime()
+    return valor["valor"]
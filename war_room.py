@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+
+import requests
+import streamlit as st
+
+import snapshots
+
+# Endereços sobrescrevíveis nos secrets (ex.: o servidor stub dos benchmarks)
+WAR_ROOM_URL = st.secrets.get("war_room_url", "https://war-room-vejv.vercel.app/api/war-room")
+WAR_ROOM_WEEK_URL = st.secrets.get("war_room_week_url", "https://war-room-vejv.vercel.app/api/war-room-week")
+
+BACKOFF_MAX_S = 300         # teto da espera entre tentativas quando a API está falhando
+OCIOSO_S = 600              # sem nenhuma leitura por esse tempo, o poller dorme até alguém abrir a aba
+INTERVALO_MIN_MANUAL_S = 2  # cliques em "Atualizar agora" dentro dessa janela reaproveitam a última busca
+
+# ========================================================
+#     POLLER DO WAR ROOM (UM POR PROCESSO)
+# ========================================================
+# Uma thread por endpoint busca a API em intervalo fixo (com backoff exponencial
+# nos erros) e guarda o último payload válido em memória compartilhada. As sessões
+# só leem esse snapshot: com a sala inteira aberta no painel, a API recebe uma
+# requisição por intervalo, não uma por navegador. A sessão HTTP é persistente
+# (keep-alive) e as revalidações usam If-None-Match / If-Modified-Since.
+# Com nome_snapshot, o último payload também vai para o disco: num processo novo a
+# página abre com ele (e a idade real) enquanto a primeira busca acontece.
+class ClienteWarRoom:
+    def __init__(self, url, nome, timeout, intervalo_s, backoff_max_s=BACKOFF_MAX_S, ocioso_s=OCIOSO_S, nome_snapshot=None):
+        self.url = url
+        self.nome = nome
+        self.timeout = timeout
+        self.intervalo_s = intervalo_s
+        self.backoff_max_s = backoff_max_s
+        self.ocioso_s = ocioso_s
+        self.sessao = requests.Session()
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.thread = None
+        self.payload = None
+        self.obtido_em = None
+        self.etag = None
+        self.last_modified = None
+        self.ultimo_erro = None
+        self.falhas = 0
+        self.ciclo = 0  # buscas concluídas (com sucesso ou não)
+        self.buscando = False
+        self.pedido_manual = False
+        self.ultimo_acesso = time.time()
+        self.requisicoes = 0
+        self.nome_snapshot = nome_snapshot
+        if nome_snapshot:
+            self._carregar_snapshot()
+
+    def _carregar_snapshot(self):
+        lido = snapshots.ler_json(self.nome_snapshot)
+        if lido is None or not isinstance(lido.get("dados"), list):
+            return
+        self.payload = lido["dados"]
+        self.obtido_em = lido["salvo_em"]
+        self.etag = lido.get("etag")
+        self.last_modified = lido.get("last_modified")
+
+    def _buscar(self):
+        # Só a thread do poller chama: a requests.Session nunca é usada em paralelo
+        headers = {}
+        with self.lock:
+            if self.payload is not None:
+                if self.etag: headers["If-None-Match"] = self.etag
+                if self.last_modified: headers["If-Modified-Since"] = self.last_modified
+            self.requisicoes += 1
+        resp = self.sessao.get(self.url, headers=headers, timeout=self.timeout)
+        if resp.status_code == 304:
+            with self.lock:
+                self.obtido_em = time.time()
+            return
+        resp.raise_for_status()
+        data = resp.json()
+        if not isinstance(data, list):
+            raise ValueError(f"Resposta inesperada da API {self.nome}.")
+        with self.lock:
+            self.payload = data
+            self.obtido_em = time.time()
+            self.etag = resp.headers.get("ETag")
+            self.last_modified = resp.headers.get("Last-Modified")
+        if self.nome_snapshot:
+            snapshots.gravar_em_segundo_plano(
+                snapshots.salvar_json, self.nome_snapshot, data,
+                {"etag": self.etag, "last_modified": self.last_modified}
+            )
+
+    def _ciclo(self):
+        with self.cond:
+            self.buscando = True
+            self.pedido_manual = False
+        erro = None
+        try:
+            self._buscar()
+        except Exception as e:
+            erro = e
+        with self.cond:
+            self.buscando = False
+            self.ultimo_erro = erro
+            self.falhas = self.falhas + 1 if erro is not None else 0
+            self.ciclo += 1
+            self.cond.notify_all()
+
+    def _espera(self):
+        if self.falhas == 0:
+            return self.intervalo_s
+        # Backoff exponencial com um pouco de jitter, limitado por backoff_max_s
+        return min(self.intervalo_s * 2 ** self.falhas, self.backoff_max_s) * random.uniform(0.8, 1.0)
+
+    def _laco(self):
+        while True:
+            self._ciclo()
+            with self.cond:
+                self.cond.wait_for(lambda: self.pedido_manual, timeout=self._espera())
+                # Ninguém olhando: para de consultar a API até a próxima leitura
+                self.cond.wait_for(lambda: self.pedido_manual or time.time() - self.ultimo_acesso < self.ocioso_s)
+
+    def iniciar(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._laco, daemon=True, name=f"poller-{self.nome}")
+                self.thread.start()
+        return self
+
+    def idade_s(self):
+        with self.lock:
+            return None if self.obtido_em is None else time.time() - self.obtido_em
+
+    def obter(self):
+        # Não faz I/O: devolve o snapshot atual. Só espera pela primeira busca do processo
+        # (e nem por ela, se o snapshot do disco já trouxe um payload).
+        with self.cond:
+            self.ultimo_acesso = time.time()
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: self.ciclo > 0 or self.payload is not None, timeout=self.timeout)
+            if self.payload is None and self.ultimo_erro is not None:
+                raise self.ultimo_erro
+            return self.payload
+
+    def atualizar_agora(self):
+        # Se já há uma busca em andamento, espera por ela em vez de disparar outra
+        with self.cond:
+            self.ultimo_acesso = time.time()
+            recente = self.obtido_em is not None and time.time() - self.obtido_em < INTERVALO_MIN_MANUAL_S
+            if not recente:
+                ciclo_inicial = self.ciclo
+                if not self.buscando:
+                    self.pedido_manual = True
+                    self.cond.notify_all()
+                self.cond.wait_for(lambda: self.ciclo > ciclo_inicial, timeout=self.timeout)
+            if self.payload is None and self.ultimo_erro is not None:
+                raise self.ultimo_erro
+            return self.payload
+
+def legenda_idade(cliente):
+    idade = cliente.idade_s()
+    if idade is None:
+        return "sem dados"
+    texto = f"dados de {time.strftime('%H:%M:%S', time.localtime(cliente.obtido_em))} (há {idade:.0f} s)"
+    if cliente.ultimo_erro is not None:
+        texto += f" | ⚠️ última atualização falhou: {cliente.ultimo_erro}"
+    return texto
+
+# ========================================================
+# FUNÇÕES PARA BUSCAR DADOS DO WAR ROOM (API)
+# ========================================================
+@st.cache_resource
+def cliente_war_room():
+    return ClienteWarRoom(WAR_ROOM_URL, "War Room", timeout=10, intervalo_s=10, nome_snapshot="war_room").iniciar()
+
+@st.cache_resource
+def cliente_war_room_week():
+    return ClienteWarRoom(WAR_ROOM_WEEK_URL, "War Room Week", timeout=15, intervalo_s=300, nome_snapshot="war_room_week").iniciar()
+
+def carregar_war_room():
+    return cliente_war_room().obter()
+
+def carregar_war_room_week():
+    return cliente_war_room_week().obter()